@@ -0,0 +1,202 @@
+"""
+Headless benchmarks of the simulation and the analysis pipeline.
+
+    python benchmark.py                          # quick run, prints the results
+    python benchmark.py --full --save base.json  # full run (up to 10,000 chickens), save a baseline
+    python benchmark.py --compare base.json      # compare with a baseline, exit code 1 on regressions
+
+Every case reports seconds per call (fastest of repeated calls), lower is better.
+"""
+import os
+
+# headless: no pygame banner or window, no interactive matplotlib backend
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+import numpy as np
+
+from main import build_cage, random_free_position
+from src.Chicken import RandomChicken, WeightedRandomChicken
+from src.utils import calculate_avg_adj_list, read_all_weeks, create_graph, louvain_communities
+import community as community_louvain
+
+CHICKEN_TYPES = ("random", "weighted", "follower", "follower_groups")
+CAGE_SIZES = {"small": (18, 10), "large": (100, 60)}
+
+PRESETS = {
+    "quick": {"flock_sizes": (20, 200), "cage_sizes": ("small",), "analysis_sizes": (20, 100),
+              "object_follower_max": 200, "min_time": 0.2},
+    "full": {"flock_sizes": (20, 100, 1000, 10000), "cage_sizes": ("small", "large"),
+             "analysis_sizes": (20, 100, 500), "object_follower_max": 1000, "min_time": 1.0},
+}
+
+
+def time_call(function, min_time=0.2, max_calls=10000):
+    """
+    Fastest wall time of function() in seconds (least disturbed by other load on the machine).
+
+    After one warm-up call, function is called until min_time has passed (at least 3
+    times, unless one call already takes longer than min_time).
+    """
+    function()
+    times = []
+    start = time.perf_counter()
+    while len(times) < max_calls:
+        t = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - t)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time and (len(times) >= 3 or times[0] >= min_time):
+            break
+    return float(np.min(times))
+
+
+def make_cage(chicken_type, n_chicken, width, height, engine="object", seed=0):
+    """Cage of build_cage populated with n_chicken chickens of one of CHICKEN_TYPES."""
+    random.seed(seed)
+    np.random.seed(seed)
+    if chicken_type.startswith("follower"):
+        return build_cage(use_follower_chickens=True, height=height, width=width, n_chicken=n_chicken,
+                          groups=chicken_type == "follower_groups", engine=engine, verbose=False)
+    cage = build_cage(height=height, width=width, n_chicken=0)
+    chicken_class = RandomChicken if chicken_type == "random" else WeightedRandomChicken
+    cage.chickens = [chicken_class(*random_free_position(cage), cage) for _ in range(n_chicken)]
+    cage.build_object_names()
+    return cage
+
+
+def simulation_cases(preset):
+    """(name, cage factory) of every step throughput case of a preset."""
+    cases = []
+    for cage_size in preset["cage_sizes"]:
+        width, height = CAGE_SIZES[cage_size]
+        for n_chicken in preset["flock_sizes"]:
+            for chicken_type in CHICKEN_TYPES:
+                engines = ["object"]
+                if chicken_type.startswith("follower"):
+                    # one object engine step of 10,000 followers takes minutes
+                    if n_chicken > preset["object_follower_max"]:
+                        engines = []
+                    engines.append("vector")
+                for engine in engines:
+                    name = f"{chicken_type}/{engine}/n={n_chicken}/{cage_size}"
+                    cases.append((name, lambda c=chicken_type, n=n_chicken, w=width, h=height, e=engine:
+                                  make_cage(c, n, w, h, engine=e)))
+    return cases
+
+
+def benchmark_simulation(preset, name_filter=None):
+    """Seconds per step and per adjacency snapshot (dense and csr) of every simulation case."""
+    results = {}
+    for name, factory in simulation_cases(preset):
+        if name_filter and name_filter not in name:
+            continue
+        cage = factory()
+        measure(results, f"step/{name}", cage.update, preset["min_time"])
+        for fmt in ("dense", "csr"):
+            measure(results, f"snapshot-{fmt}/{name}", lambda: cage.get_adj_matr(fmt=fmt), preset["min_time"])
+    return results
+
+
+def benchmark_analysis(preset, name_filter=None, n_snapshots=100, week_size=5):
+    """Seconds per call of the analysis pipeline on n_snapshots random snapshots."""
+    results = {}
+    rng = np.random.default_rng(0)
+    for n in preset["analysis_sizes"]:
+        name = f"n={n}"
+        adj_lists = [rng.random((n, n)) < 0.1 for _ in range(n_snapshots)]
+        avg_adj_list = calculate_avg_adj_list(adj_lists)
+        graph = create_graph(avg_adj_list)
+        cases = {
+            "calculate_avg_adj_list": lambda: calculate_avg_adj_list(adj_lists),
+            "read_all_weeks": lambda: read_all_weeks(adj_lists, week_size=week_size),
+            "create_graph": lambda: create_graph(avg_adj_list),
+            "louvain": lambda: community_louvain.best_partition(graph, random_state=0),
+            "sparse_louvain": lambda: louvain_communities(avg_adj_list, seed=0),
+        }
+        for case, function in cases.items():
+            if not name_filter or name_filter in f"analysis/{case}/{name}":
+                measure(results, f"analysis/{case}/{name}", function, preset["min_time"])
+    return results
+
+
+def measure(results, name, function, min_time):
+    """Time function, store the result under name and print it with the rate per second."""
+    seconds = time_call(function, min_time)
+    results[name] = seconds
+    rate = f"{1 / seconds:10.1f} /s" if seconds > 0 else ""
+    print(f"{name:55s} {seconds * 1000:12.3f} ms {rate}", flush=True)
+
+
+def environment():
+    return {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+            "processor": platform.processor(), "system": platform.system(),
+            "date": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+def save_baseline(path, results, preset_name):
+    with open(path, "w") as f:
+        json.dump({"preset": preset_name, "environment": environment(), "results": results}, f, indent=2)
+
+
+def compare(results, baseline, threshold=0.2):
+    """
+    Compare results with a baseline.
+
+    A case is a regression if it got slower by more than threshold (0.2 = 20%) and an
+    improvement if it got faster by the same factor.
+
+    Returns:
+        list: Names of the regressed cases
+    """
+    regressions = []
+    print(f"\n{'case':55s} {'baseline ms':>12s} {'now ms':>12s} {'ratio':>7s}")
+    for name, seconds in results.items():
+        if name not in baseline:
+            continue
+        ratio = seconds / baseline[name] if baseline[name] > 0 else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 / (1 + threshold):
+            flag = "faster"
+        print(f"{name:55s} {baseline[name] * 1000:12.3f} {seconds * 1000:12.3f} {ratio:7.2f} {flag}")
+    missing = [name for name in baseline if name not in results]
+    if missing:
+        print(f"{len(missing)} baseline cases were not run")
+    print(f"{len(regressions)} regressions (threshold {threshold:.0%})")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the chicken simulation and analysis pipeline")
+    parser.add_argument("--full", action="store_true", help="flocks of 20 to 10,000 chickens and a large cage")
+    parser.add_argument("--filter", help="only run cases whose name contains this string")
+    parser.add_argument("--save", help="save the results as a baseline JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative slowdown that counts as regression")
+    args = parser.parse_args()
+
+    preset_name = "full" if args.full else "quick"
+    preset = PRESETS[preset_name]
+    print(f"Preset {preset_name}: {environment()}")
+    results = benchmark_simulation(preset, args.filter)
+    results.update(benchmark_analysis(preset, args.filter))
+
+    if args.save:
+        save_baseline(args.save, results, preset_name)
+        print(f"Saved baseline to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
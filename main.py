@@ -1,246 +1,516 @@
-from src.Cage import Cage
-from src.Chicken import RandomChicken
-from src.Chicken import FollowerChicken
-from src.utils import calculate_avg_adj_list, visualize_graph, read_all_weeks, create_graph_from_adj_matrix
-import random
-import numpy as np
-
-def run_simulation(use_follower_chickens=False, height=8, width=12, n_chicken=20, analyze_only_chicken=False,
-                   n_steps=1000, visual=False, adj_matrix_interval=5, pygames_grid=True, groups=False):
-    """
-    Run a chicken simulation with either RandomChickens or FollowerChickens.
-    
-    Args:
-        use_follower_chickens: If True, use FollowerChickens with social relationships, else use RandomChickens
-        height: Height of the cage
-        width: Width of the cage
-        n_chicken: Number of chickens to simulate
-        analyze_only_chicken: If True, only analyze chicken relationships, ignore resources
-        
-    Returns:
-        tuple: (avg_adj_list, names, df) - Results of the simulation
-    """
-    # Create an empty cage first
-    cage = Cage(width=width, height=height, chickens=[], 
-                food_positions=[(9, 4), (8, height-3)], 
-                water_positions=[(width-3, height-4)], 
-                bath_positions=[(width-7, 0),(width-6, 0),(width-5, 0)])
-    
-    # Create chickens based on the specified type with reference to the cage
-    if use_follower_chickens:
-        chickens = [FollowerChicken(random.randint(0, width-1), random.randint(0, height-1), cage) 
-                    for _ in range(n_chicken)]
-        
-        # Assign social relationships
-        if groups:
-            assign_social_relationships_even_vs_odd(chickens)
-        else:
-            assign_social_relationships(chickens)
-    else:
-        chickens = [RandomChicken(random.randint(0, width-1), random.randint(0, height-1), cage) 
-                    for _ in range(n_chicken)]
-    
-    # Add chickens to the cage
-    cage.chickens = chickens
-    #this fcks up the names....
-    cage.all_object_names = [f"chicken_{i}" for i in range(len(cage.chickens))] + \
-                [f"food_{i}" for i in range(len(cage.food_sources))] +   \
-                [f"water_{i}" for i in range(len(cage.water_sources))] + \
-                [f"bath_{i}" for i in range(len(cage.bathing_areas))]
-    
-    # Run simulation
-    if pygames_grid:
-        adj_lists = cage.simulate_visual(n_steps, adj_matrix_interval=adj_matrix_interval, visual=visual)
-    else:
-        adj_lists = cage.simulate(n_steps, adj_matrix_interval=5, visual=visual)
-    
-    # Process results
-    avg_adj_list = calculate_avg_adj_list(adj_lists)
-    names = cage.all_object_names
-    
-    print("Analysis")
-    df = read_all_weeks(adj_lists, week_size=5)
-     
-    visualize_graph(avg_adj_list, names, min_weight=.11,
-                    max_size=n_chicken if analyze_only_chicken else None)
-    # Create graph visualization
-    create_graph_from_adj_matrix(avg_adj_list, all_object_names=names, 
-                              clustering_method='louvain', 
-                              max_size=n_chicken if analyze_only_chicken else None)
-    
-    #find_roles(avg_adj_list, max_size=n_chicken if analyze_only_chicken else None)
-    return avg_adj_list, names, df
-
-def assign_social_relationships_even_vs_odd(chickens):
-    """
-    Assign friendships and enmities based on even and odd indices.
-
-    Even-indexed chickens are friends with all other even-indexed chickens,
-    and odd-indexed chickens are friends with all other odd-indexed chickens.
-    Chickens at even indices and odd indices are enemies.
-
-    Args:
-        chickens: List of FollowerChicken instances
-    """
-    n_chicken = len(chickens)
-
-    for i in range(n_chicken):
-        if i % 2 == 0:
-            for j in range(i + 1, n_chicken):
-                if j % 2 == 0:  # Same parity, even index -> friendship
-                    chickens[i].add_friend(chickens[j])
-                    chickens[j].add_friend(chickens[i])  
-        else:
-            for j in range(i + 1, n_chicken):
-                if j % 2 != 0:  
-                    chickens[i].add_friend(chickens[j])
-                    chickens[j].add_friend(chickens[i]) 
-    
-    for i in range(n_chicken):
-        for j in range(i + 1, n_chicken):
-            if (i % 2 == 0 and j % 2 != 0) or (i % 2 != 0 and j % 2 == 0):
-                chickens[i].add_enemy(chickens[j])
-                chickens[j].add_enemy(chickens[i])  
-
-    print("\nSocial Relationship Statistics:")
-    friend_counts = [len(chicken.friends) for chicken in chickens]
-    enemy_counts = [len(chicken.enemies) for chicken in chickens]
-    for chicken_id in range(len(chickens)):
-        print(f"Chicken {chickens[chicken_id].id} has friends: {[c.id for c in chickens[chicken_id].friends]} and enemies {[c.id for c in chickens[chicken_id].enemies]}")
-    print(f"Average friends per chicken: {sum(friend_counts)/n_chicken:.2f}")
-    print(f"Average enemies per chicken: {sum(enemy_counts)/n_chicken:.2f}")
-    print(f"Most popular chicken has {max(friend_counts)} friends")
-    print(f"Most hated chicken has {max(enemy_counts)} enemies")
-    print(f"Most antisocial chicken has {min(friend_counts)} friends and {min(enemy_counts)} enemies")
-
-
-def assign_social_relationships(chickens):
-    """
-    Intelligently assign friends and enemies among chickens.
-    
-    The assignment follows these principles:
-    1. Mutual friendships are more likely than one-way friendships
-    2. Each chicken gets a varying number of friends and enemies
-    3. Chickens that are friends are less likely to be enemies
-    4. Some chickens may be more popular (have more friends)
-    5. Some chickens may be bullies (have friends who consider them enemies)
-    
-    Args:
-        chickens: List of FollowerChicken instances
-    """
-    n_chicken = len(chickens)
-    
-    # Create a "personality matrix" that defines social tendencies
-    # Higher values mean more likely to be friends
-    personality_compatibility = np.random.normal(0.5, 0.25, (n_chicken, n_chicken))
-    
-    # Make it symmetric but with some noise (for mutual vs one-way friendships)
-    for i in range(n_chicken):
-        for j in range(i+1, n_chicken):
-            avg = (personality_compatibility[i, j] + personality_compatibility[j, i]) / 2
-            noise = np.random.normal(0, 0.1)
-            personality_compatibility[i, j] = avg + noise
-            personality_compatibility[j, i] = avg - noise
-    
-    # Set diagonal to 0 (chickens can't be friends/enemies with themselves)
-    np.fill_diagonal(personality_compatibility, 0)
-    
-    # Create "popularity factor" for each chicken
-    popularity = np.random.normal(1.0, 0.3, n_chicken)
-    
-    # Create "social nature" - how many relationships each chicken tends to form
-    social_nature = np.random.normal(0.3, 0.1, n_chicken)
-    
-    # Create "friend or enemy threshold" - how likely a chicken forms friendships vs enmities
-    friend_threshold = np.random.normal(0.5, 0.2, n_chicken)
-    
-    # Now assign relationships
-    for i in range(n_chicken):
-        # Determine number of relationships this chicken will form
-        total_relationships = max(1, int(n_chicken * social_nature[i]))
-        
-        # Get compatibility scores with all other chickens
-        compat_scores = personality_compatibility[i, :] * popularity
-        
-        # Sort chickens by compatibility
-        chicken_indices = np.argsort(-compat_scores)  # Descending order
-        
-        # Skip self
-        chicken_indices = chicken_indices[chicken_indices != i]
-        
-        # Select the top chickens to form relationships with
-        relationship_indices = chicken_indices[:total_relationships]
-        
-        for j in relationship_indices:
-            # Determine if this is a friendship or enmity
-            # Higher compatibility and chicken's own threshold determines this
-            relationship_score = compat_scores[j]
-            
-            if relationship_score > friend_threshold[i]:
-                # Add as friend
-                chickens[i].add_friend(chickens[j])
-                
-                # Create potential bullies - 10% chance that a chicken's "friend" actually considers them an enemy
-                if random.random() < 0.1:
-                    chickens[j].add_enemy(chickens[i])
-                    # Print this interesting relationship
-                    print(f"Bully detected: Chicken {j} is an enemy to Chicken {i}, but Chicken {i} considers Chicken {j} a friend!")
-                
-                # 70% chance of mutual friendship if i considers j a friend
-                elif random.random() < 0.7:
-                    chickens[j].add_friend(chickens[i])
-                    # Small chance (5%) that despite mutual friendship, one still considers the other an enemy
-                    if random.random() < 0.05:
-                        chickens[j].add_enemy(chickens[i])
-                        print(f"Complex relationship: Chickens {i} and {j} are friends, but {j} also considers {i} an enemy!")
-            else:
-                # Add as enemy
-                chickens[i].add_enemy(chickens[j])
-                
-                # 30% chance of mutual enmity
-                if random.random() < 0.3:
-                    chickens[j].add_enemy(chickens[i])
-    
-    # Print relationship statistics
-    print("\nSocial Relationship Statistics:")
-    friend_counts = [len(chicken.friends) for chicken in chickens]
-    enemy_counts = [len(chicken.enemies) for chicken in chickens]
-    for chicken_id in range(len(chickens)):
-        print(f"Chicken {chickens[chicken_id].id} has friends: {[c.id for c in chickens[chicken_id].friends]} and enemies {[c.id for c in chickens[chicken_id].enemies]}")
-    print(f"Average friends per chicken: {sum(friend_counts)/n_chicken:.2f}")
-    print(f"Average enemies per chicken: {sum(enemy_counts)/n_chicken:.2f}")
-    print(f"Most popular chicken has {max(friend_counts)} friends")
-    print(f"Most hated chicken has {max(enemy_counts)} enemies")
-    print(f"Most antisocial chicken has {min(friend_counts)} friends and {min(enemy_counts)} enemies")
-
-
-if __name__ == "__main__":
-    seed = 0 
-    random.seed(seed)
-    np.random.seed(seed)
-
-    # Parameters
-    HEIGHT = 10
-    WIDTH = 18
-    N_CHICKEN = 20
-    ANALYZE_ONLY_CHICKEN = False
-    USE_FOLLOWER_CHICKENS = True  # Set to False to use the original RandomChicken behavior
-    N_STEPS=1800 
-    VISUAL = False
-    INTERVAL = 10
-    GROUPS = False
-    print(f"Need {3*(60/5)*5=} observations and have {N_STEPS/INTERVAL=}")
-    # Run the simulation
-    avg_adj_list, names, df = run_simulation(
-        use_follower_chickens=USE_FOLLOWER_CHICKENS,
-        height=HEIGHT,
-        width=WIDTH,
-        n_chicken=N_CHICKEN,
-        analyze_only_chicken=ANALYZE_ONLY_CHICKEN,
-        n_steps = N_STEPS,
-        visual=VISUAL,
-        adj_matrix_interval= INTERVAL,
-        groups=GROUPS,
-    )
-    
+from src.Cage import Cage
+from src.VectorCage import VectorCage, BatchedCage
+from src.AdjacencyAccumulator import AdjacencyAccumulator
+from src.SimulationStats import SimulationStats
+from src.Chicken import RandomChicken
+from src.Chicken import FollowerChicken
+from src.SocialGraph import SocialGraph
+from src.Checkpoint import checkpoint_bytes, fork_cage
+from src.utils import visualize_graph, create_graph_from_adj_matrix
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import contextlib
+import io
+import random
+import numpy as np
+
+ENGINES = {"object": Cage, "vector": VectorCage}
+
+
+def build_cage(use_follower_chickens=False, height=8, width=12, n_chicken=20, groups=False, engine="object",
+               visit_memory="dense", proximity_radius=1, wall_positions=None, social_fields=False, seed=None,
+               verbose=True):
+    """
+    Build the cage layout used by run_simulation and populate it with chickens.
+    
+    Args:
+        engine: "object" steps every chicken object in turn (Cage), "vector" advances
+            a FollowerChicken flock in batched numpy operations (VectorCage)
+        visit_memory: "dense" timestamp grid per chicken or "ring" buffer of recent positions (huge grids)
+        proximity_radius: Chebyshev distance at which two objects count as adjacent in snapshots
+        wall_positions: Cells chickens cannot enter, chickens are placed on the free cells
+        social_fields: With the vector engine and groups=True, score the social terms from
+            per-group potential maps instead of all pairs (scales to thousands of chickens)
+        seed: If set (int or np.random.SeedSequence), every chicken moves with its own reproducible
+            random stream, so changing one chicken does not change the random numbers of the others
+        verbose: If True, print the social relationships
+        
+    Returns:
+        Cage: The populated cage
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine}")
+    engine_kwargs = {}
+    if social_fields:
+        if engine != "vector":
+            raise ValueError("social_fields needs the vector engine")
+        engine_kwargs["social_fields"] = True
+    # Create an empty cage first
+    cage = ENGINES[engine](width=width, height=height, chickens=[], 
+                food_positions=[(9, 4), (8, height-3)], 
+                water_positions=[(width-3, height-4)], 
+                bath_positions=[(width-7, 0),(width-6, 0),(width-5, 0)],
+                visit_memory=visit_memory, proximity_radius=proximity_radius, wall_positions=wall_positions,
+                seed=seed, **engine_kwargs)
+    
+    # Create chickens based on the specified type with reference to the cage
+    if use_follower_chickens:
+        chickens = [FollowerChicken(*random_free_position(cage), cage) 
+                    for _ in range(n_chicken)]
+        
+        # Assign social relationships
+        if groups:
+            assign_social_relationships_even_vs_odd(chickens, verbose=verbose)
+        else:
+            assign_social_relationships(chickens, verbose=verbose)
+    else:
+        chickens = [RandomChicken(*random_free_position(cage), cage) 
+                    for _ in range(n_chicken)]
+    
+    # Add chickens to the cage
+    cage.chickens = chickens
+    cage.build_object_names()
+    return cage
+
+
+def random_free_position(cage):
+    """Random cell of the cage that is not a wall."""
+    while True:
+        x, y = random.randint(0, cage.width-1), random.randint(0, cage.height-1)
+        if cage.is_valid_position(x, y):
+            return x, y
+
+
+def run_simulation(use_follower_chickens=False, height=8, width=12, n_chicken=20, analyze_only_chicken=False,
+                   n_steps=1000, visual=False, adj_matrix_interval=5, pygames_grid=True, groups=False,
+                   engine="object", profile=False, observers=(), renderer=None, monitor_port=None, seed=None):
+    """
+    Run a chicken simulation with either RandomChickens or FollowerChickens.
+    
+    Args:
+        use_follower_chickens: If True, use FollowerChickens with social relationships, else use RandomChickens
+        height: Height of the cage
+        width: Width of the cage
+        n_chicken: Number of chickens to simulate
+        analyze_only_chicken: If True, only analyze chicken relationships, ignore resources
+        engine: "object" or "vector", see build_cage. The vector engine needs FollowerChickens
+        profile: If True, time every phase of the run (and every chicken type) in the final report
+        observers: Extra collectors (see src/Observer.py), e.g. NeedSeries or ResourceUsage
+        renderer: "none", "terminal", "pygame" or "video" (see src/Renderer.py), overrides visual
+        monitor_port: If set, publish the running state on http://127.0.0.1:<port>/ (see src/LiveMonitor.py)
+        seed: Seed of the chickens' own random streams, see build_cage
+        
+    Returns:
+        tuple: (avg_adj_list, names, df) - Results of the simulation
+    """
+    cage = build_cage(use_follower_chickens=use_follower_chickens, height=height, width=width,
+                      n_chicken=n_chicken, groups=groups, engine=engine, seed=seed)
+    
+    # Run simulation, snapshots are averaged while running instead of being kept
+    accumulator = AdjacencyAccumulator(week_size=5)
+    stats = SimulationStats(enabled=profile, per_type=profile)
+    if monitor_port is not None:
+        from src.LiveMonitor import LiveMonitor
+
+        observers = list(observers) + [LiveMonitor(port=monitor_port, snapshot_interval=adj_matrix_interval)]
+    if pygames_grid:
+        cage.simulate_visual(n_steps, adj_matrix_interval=adj_matrix_interval, visual=visual,
+                             accumulator=accumulator, stats=stats, observers=observers, renderer=renderer)
+    else:
+        cage.simulate(n_steps, adj_matrix_interval=5, visual=visual, accumulator=accumulator, stats=stats,
+                      observers=observers, renderer=renderer)
+    
+    # Process results
+    avg_adj_list = accumulator.average()
+    names = cage.all_object_names
+    
+    print("Analysis")
+    df = accumulator.to_dataframe()
+     
+    visualize_graph(avg_adj_list, names, min_weight=.11,
+                    max_size=n_chicken if analyze_only_chicken else None)
+    # Create graph visualization
+    create_graph_from_adj_matrix(avg_adj_list, all_object_names=names, 
+                              clustering_method='louvain', 
+                              max_size=n_chicken if analyze_only_chicken else None)
+    
+    #find_roles(avg_adj_list, max_size=n_chicken if analyze_only_chicken else None)
+    return avg_adj_list, names, df
+
+def assign_social_relationships_even_vs_odd(chickens, verbose=True):
+    """
+    Assign friendships and enmities based on even and odd indices.
+
+    Even-indexed chickens are friends with all other even-indexed chickens,
+    and odd-indexed chickens are friends with all other odd-indexed chickens.
+    Chickens at even indices and odd indices are enemies.
+
+    Args:
+        chickens: List of FollowerChicken instances
+        verbose: If True, print the relationships and their statistics
+        
+    Returns:
+        SocialGraph: The relationships, also attached to every chicken
+    """
+    graph = SocialGraph(chickens)
+    # the edges are only built when read, social_fields of the vector engine needs only the groups
+    graph.set_groups(np.arange(len(chickens)) % 2)
+
+    if verbose:
+        print_relationship_statistics(graph)
+    return graph
+
+
+def assign_social_relationships(chickens, verbose=True, block_size=1024):
+    """
+    Intelligently assign friends and enemies among chickens.
+    
+    The assignment follows these principles:
+    1. Mutual friendships are more likely than one-way friendships
+    2. Each chicken gets a varying number of friends and enemies
+    3. Chickens that are friends are less likely to be enemies
+    4. Some chickens may be more popular (have more friends)
+    5. Some chickens may be bullies (have friends who consider them enemies)
+    
+    The relationships of block_size chickens are drawn at a time, so the full
+    compatibility matrix is never held in memory.
+    
+    Args:
+        chickens: List of FollowerChicken instances
+        verbose: If True, print bullies, complex relationships and statistics
+        
+    Returns:
+        SocialGraph: The relationships, also attached to every chicken
+    """
+    n_chicken = len(chickens)
+    graph = SocialGraph(chickens)
+    
+    # Seed of the "personality matrix" that defines social tendencies, see compatibility_rows
+    personality_seed = int(np.random.randint(2**31))
+    
+    # Create "popularity factor" for each chicken
+    popularity = np.random.normal(1.0, 0.3, n_chicken)
+    
+    # Create "social nature" - how many relationships each chicken tends to form
+    social_nature = np.random.normal(0.3, 0.1, n_chicken)
+    
+    # Create "friend or enemy threshold" - how likely a chicken forms friendships vs enmities
+    friend_threshold = np.random.normal(0.5, 0.2, n_chicken)
+    
+    # Number of relationships every chicken will form
+    total_relationships = np.minimum(n_chicken - 1, np.maximum(1, (n_chicken * social_nature).astype(int)))
+    
+    edges = {"friends": ([], []), "enemies": ([], [])}
+    def add(kind, rows, cols):
+        edges[kind][0].append(rows)
+        edges[kind][1].append(cols)
+    
+    for start in range(0, n_chicken, block_size):
+        rows = np.arange(start, min(start + block_size, n_chicken))
+        
+        # Compatibility with all other chickens, skipping self
+        compat_scores = compatibility_rows(personality_seed, n_chicken, start, block_size) * popularity
+        compat_scores[rows - start, rows] = -np.inf
+        
+        # Select the most compatible chickens to form relationships with
+        order = np.argsort(-compat_scores, axis=1)
+        selected = np.arange(n_chicken) < total_relationships[rows, None]
+        i = np.repeat(rows, total_relationships[rows])
+        j = order[selected]
+        
+        # Higher compatibility and the chicken's own threshold decide friendship or enmity
+        friend = compat_scores[i - start, j] > friend_threshold[i]
+        u_first, u_mutual, u_complex = np.random.random((3, len(i)))
+        # 10% chance that a chicken's "friend" actually considers them an enemy
+        bully = friend & (u_first < 0.1)
+        # 70% chance of mutual friendship otherwise
+        mutual = friend & ~bully & (u_mutual < 0.7)
+        # Small chance (5%) that despite mutual friendship, one still considers the other an enemy
+        complex_relationship = mutual & (u_complex < 0.05)
+        # 30% chance of mutual enmity
+        mutual_enemy = ~friend & (u_first < 0.3)
+        
+        add("friends", i[friend], j[friend])
+        add("friends", j[mutual], i[mutual])
+        add("enemies", i[~friend], j[~friend])
+        both = bully | complex_relationship | mutual_enemy
+        add("enemies", j[both], i[both])
+        
+        if verbose:
+            for a, b in zip(i[bully], j[bully]):
+                print(f"Bully detected: Chicken {b} is an enemy to Chicken {a}, but Chicken {a} considers Chicken {b} a friend!")
+            for a, b in zip(i[complex_relationship], j[complex_relationship]):
+                print(f"Complex relationship: Chickens {a} and {b} are friends, but {b} also considers {a} an enemy!")
+    
+    for kind, (rows, cols) in edges.items():
+        graph.set_edges(kind, np.concatenate(rows + [np.empty(0, dtype=int)]),
+                        np.concatenate(cols + [np.empty(0, dtype=int)]))
+    
+    if verbose:
+        print_relationship_statistics(graph)
+    return graph
+
+
+def compatibility_rows(seed, n_chicken, start, block_size):
+    """
+    Rows start:start+block_size of the personality compatibility matrix.
+
+    Entry (i, j) is avg + noise and entry (j, i) avg - noise, with avg the mean of two
+    N(0.5, 0.25) draws and noise N(0, 0.1) (mutual vs one-way friendships). The diagonal
+    is 0. Every block_size x block_size block of pairs has its own generator, seeded with
+    seed and the block, so any rows can be built without the full matrix.
+    """
+    stop = min(start + block_size, n_chicken)
+    block = start // block_size
+    compatibility = np.empty((stop - start, n_chicken))
+    for col_start in range(0, n_chicken, block_size):
+        col_stop = min(col_start + block_size, n_chicken)
+        col_block = col_start // block_size
+        low, high = sorted((block, col_block))
+        rng = np.random.default_rng([seed, low, high])
+        shape = (min(block_size, n_chicken - low * block_size), min(block_size, n_chicken - high * block_size))
+        draws = rng.normal(0.5, 0.25, (2,) + shape)
+        noise = rng.normal(0, 0.1, shape)
+        if low == high:
+            # pairs within the block: the upper triangle holds (i, j), i < j
+            avg = (draws[0] + draws[0].T) / 2
+            noise = np.triu(noise, 1)
+            values = avg + noise - noise.T
+            np.fill_diagonal(values, 0)
+        elif block == low:
+            values = (draws[0] + draws[1]) / 2 + noise
+        else:
+            values = ((draws[0] + draws[1]) / 2 - noise).T
+        compatibility[:, col_start:col_stop] = values
+    return compatibility
+
+
+def print_relationship_statistics(graph):
+    """Print the friends and enemies of every chicken and summary statistics of a SocialGraph."""
+    print("\nSocial Relationship Statistics:")
+    for chicken in graph.chickens:
+        print(f"Chicken {chicken.id} has friends: {[c.id for c in chicken.friends]} and enemies {[c.id for c in chicken.enemies]}")
+    if graph.n == 0:
+        return
+    statistics = graph.statistics()
+    print(f"Average friends per chicken: {statistics['mean_friends']:.2f}")
+    print(f"Average enemies per chicken: {statistics['mean_enemies']:.2f}")
+    print(f"Most popular chicken has {statistics['max_friends']} friends")
+    print(f"Most hated chicken has {statistics['max_enemies']} enemies")
+    print(f"Most antisocial chicken has {statistics['min_friends']} friends and {statistics['min_enemies']} enemies")
+
+
+def summarize_contacts(avg_adj_list, n_chicken, resource_kinds):
+    """
+    Summary statistics of an averaged adjacency matrix laid out as in run_simulation.
+    
+    Args:
+        resource_kinds: Kind ("food", "water" or "bath") of every resource column, cage.resource_kinds
+    
+    Returns:
+        dict: Mean contact rate between chickens and between chickens and each resource type
+    """
+    chicken_block = avg_adj_list[:n_chicken, :n_chicken]
+    off_diagonal = ~np.eye(n_chicken, dtype=bool)
+    kinds = np.array(resource_kinds)
+    summary = {"chicken": chicken_block[off_diagonal].mean()}
+    for kind in ("food", "water", "bath"):
+        summary[kind] = avg_adj_list[:n_chicken, n_chicken:][:, kinds == kind].mean()
+    return summary
+
+
+def compare_engines(n_replicates=10, height=10, width=18, n_chicken=20, n_steps=500,
+                    adj_matrix_interval=10, groups=False, seed=0):
+    """
+    Validate the vector engine against the object engine.
+    
+    Both engines run the same replicates (same seeds, so same start positions and
+    relationships) and the contact statistics of summarize_contacts are compared
+    with a Welch t statistic. |t| well below 2 means no detectable difference.
+    
+    Returns:
+        dict: statistic -> (object mean, vector mean, t statistic)
+    """
+    results = {"object": [], "vector": []}
+    for engine in results:
+        for replicate in range(n_replicates):
+            random.seed(seed + replicate)
+            np.random.seed(seed + replicate)
+            cage = build_cage(use_follower_chickens=True, height=height, width=width,
+                              n_chicken=n_chicken, groups=groups, engine=engine, verbose=False)
+            accumulator = AdjacencyAccumulator()
+            cage.simulate(n_steps, adj_matrix_interval=adj_matrix_interval, visual=False, accumulator=accumulator,
+                          report=False)
+            results[engine].append(summarize_contacts(accumulator.average(), n_chicken, cage.resource_kinds))
+
+    comparison = {}
+    for statistic in results["object"][0]:
+        a = np.array([r[statistic] for r in results["object"]])
+        b = np.array([r[statistic] for r in results["vector"]])
+        standard_error = np.sqrt(a.var(ddof=1) / len(a) + b.var(ddof=1) / len(b))
+        t = (a.mean() - b.mean()) / standard_error if standard_error > 0 else 0.0
+        comparison[statistic] = (a.mean(), b.mean(), t)
+        print(f"{statistic}: object {a.mean():.4f} \tvector {b.mean():.4f} \tt={t:.2f}")
+    return comparison
+
+
+def seed_global_state(seed_sequence):
+    """Seed the global random and np.random states from a np.random.SeedSequence."""
+    state = seed_sequence.generate_state(2)
+    random.seed(int(state[0]))
+    np.random.seed(state)
+
+
+def start_cage(seed_sequence, checkpoint=None, **cage_kwargs):
+    """New cage of build_cage, or a fork of the checkpoint bytes with streams from seed_sequence."""
+    if checkpoint is not None:
+        return fork_cage(checkpoint, seed=seed_sequence)
+    return build_cage(seed=seed_sequence, **cage_kwargs)
+
+
+def burn_in_checkpoint(seed_sequence, burn_in=100, **cage_kwargs):
+    """Bytes of a cage of build_cage after burn_in steps, the common start of forked replicates."""
+    seed_global_state(seed_sequence)
+    with contextlib.redirect_stdout(io.StringIO()):
+        cage = build_cage(seed=seed_sequence, **cage_kwargs)
+    for _ in range(burn_in):
+        cage.update()
+    return checkpoint_bytes(cage, global_random=False)
+
+
+def run_replicate(seed_sequence, n_steps=1000, adj_matrix_interval=5, week_size=5, quiet=True, checkpoint=None,
+                  **cage_kwargs):
+    """
+    Run one headless replicate of the simulation.
+    
+    The global random and np.random states (start positions, relationships) are seeded from
+    seed_sequence and every chicken gets its own stream spawned from it, so a replicate
+    gives the same result whichever process runs it and in whatever order.
+    
+    Args:
+        seed_sequence: np.random.SeedSequence of this replicate
+        quiet: If True, suppress the relationship statistics and end report
+        checkpoint: Bytes of a burned-in cage (see shared_burn_in of run_ensemble), forked
+            with new random streams instead of building and burning in a new cage
+        cage_kwargs: Passed on to build_cage
+        
+    Returns:
+        tuple: (avg_adj_list, df, names)
+    """
+    seed_global_state(seed_sequence)
+    with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+        cage = start_cage(seed_sequence, checkpoint, **cage_kwargs)
+        accumulator = AdjacencyAccumulator(week_size=week_size)
+        cage.simulate(n_steps, adj_matrix_interval=adj_matrix_interval, visual=False, accumulator=accumulator,
+                      burn_in=0 if checkpoint else 100)
+    return accumulator.average(), accumulator.to_dataframe(), cage.all_object_names
+
+
+def run_batch(seed_sequences, n_steps=1000, adj_matrix_interval=5, week_size=5, quiet=True, checkpoint=None,
+              **cage_kwargs):
+    """
+    Run several replicates together in a BatchedCage (FollowerChickens only).
+    
+    Each cage is built (or forked from checkpoint) from its own seed sequence like in
+    run_replicate, and the chickens keep their own random streams inside the batch, so a
+    replicate gives the same result in any batch as run_replicate with engine="vector".
+    
+    Returns:
+        list: (avg_adj_list, df, names) per replicate
+    """
+    with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+        cages = []
+        for seed_sequence in seed_sequences:
+            seed_global_state(seed_sequence)
+            cages.append(start_cage(seed_sequence, checkpoint, **cage_kwargs))
+        accumulators = [AdjacencyAccumulator(week_size=week_size) for _ in cages]
+        batch = BatchedCage(cages, social_fields=cage_kwargs.get("social_fields", False))
+        batch.simulate(n_steps, adj_matrix_interval=adj_matrix_interval, accumulators=accumulators,
+                       burn_in=0 if checkpoint else 100)
+    return [(accumulator.average(), accumulator.to_dataframe(), cage.all_object_names)
+            for accumulator, cage in zip(accumulators, cages)]
+
+
+def run_ensemble(n_replicates=100, seed=0, processes=None, n_steps=1000, adj_matrix_interval=5, week_size=5,
+                 batch_size=None, shared_burn_in=None, **cage_kwargs):
+    """
+    Run independent replicates of the same configuration in a process pool.
+    
+    Every replicate gets its own random stream spawned from the master seed, so the
+    ensemble is reproducible regardless of the number of processes.
+    
+    Args:
+        n_replicates: Number of replicates
+        seed: Master seed
+        processes: Number of worker processes (None = all cores, 1 = run in this process)
+        batch_size: If set, every worker advances batch_size replicates together in a BatchedCage
+        shared_burn_in: If set, build one cage, run this many burn-in steps once and fork every
+            replicate from that state (same start positions and relationships, own random
+            streams) instead of building and burning in every replicate
+        cage_kwargs: Passed on to build_cage (use_follower_chickens, height, width, n_chicken, groups, engine, ...)
+        
+    Returns:
+        tuple: (avg_adj_lists, names, dfs) - stacked (n_replicates, n, n) average adjacency matrices,
+        object names and one weekly DataFrame per replicate
+    """
+    master = np.random.SeedSequence(seed)
+    seed_sequences = master.spawn(n_replicates)
+    checkpoint = None
+    if shared_burn_in:
+        checkpoint = burn_in_checkpoint(master.spawn(1)[0], burn_in=shared_burn_in, **cage_kwargs)
+    if batch_size:
+        tasks = [seed_sequences[i:i + batch_size] for i in range(0, n_replicates, batch_size)]
+        run = partial(run_batch, n_steps=n_steps, adj_matrix_interval=adj_matrix_interval,
+                      week_size=week_size, checkpoint=checkpoint, **cage_kwargs)
+    else:
+        tasks = seed_sequences
+        run = partial(run_replicate, n_steps=n_steps, adj_matrix_interval=adj_matrix_interval,
+                      week_size=week_size, checkpoint=checkpoint, **cage_kwargs)
+    if processes == 1:
+        results = list(map(run, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(run, tasks))
+    if batch_size:
+        results = [result for batch in results for result in batch]
+    avg_adj_lists = np.stack([avg for avg, _, _ in results])
+    dfs = [df for _, df, _ in results]
+    names = results[0][2] if results else []
+    return avg_adj_lists, names, dfs
+
+
+if __name__ == "__main__":
+    seed = 0 
+    random.seed(seed)
+    np.random.seed(seed)
+
+    # Parameters
+    HEIGHT = 10
+    WIDTH = 18
+    N_CHICKEN = 20
+    ANALYZE_ONLY_CHICKEN = False
+    USE_FOLLOWER_CHICKENS = True  # Set to False to use the original RandomChicken behavior
+    N_STEPS=1800 
+    VISUAL = False
+    INTERVAL = 10
+    GROUPS = False
+    ENGINE = "object"  # "vector" runs FollowerChickens in batched numpy operations
+    PROFILE = False  # time every phase of the run in the final report
+    print(f"Need {3*(60/5)*5=} observations and have {N_STEPS/INTERVAL=}")
+    # Run the simulation
+    avg_adj_list, names, df = run_simulation(
+        use_follower_chickens=USE_FOLLOWER_CHICKENS,
+        height=HEIGHT,
+        width=WIDTH,
+        n_chicken=N_CHICKEN,
+        analyze_only_chicken=ANALYZE_ONLY_CHICKEN,
+        n_steps = N_STEPS,
+        visual=VISUAL,
+        adj_matrix_interval= INTERVAL,
+        groups=GROUPS,
+        engine=ENGINE,
+        profile=PROFILE,
+        seed=seed,
+    )
+    
     
\ No newline at end of file
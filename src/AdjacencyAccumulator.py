@@ -0,0 +1,88 @@
+import numpy as np
+
+
+class AdjacencyAccumulator:
+    """
+    Running sums of adjacency snapshots, so a simulation does not keep every snapshot.
+
+    Keeps the sum over all snapshots, the sum of the current week and the averages of
+    the completed weeks. average() matches calculate_avg_adj_list and to_dataframe()
+    matches read_all_weeks with the same week_size (incomplete weeks only count
+    towards week-all).
+    """
+    def __init__(self, week_size=5):
+        self.week_size = week_size
+        self.count = 0
+        self.total = None
+        self.week_total = None
+        self.week_averages = []
+
+    def add(self, adj_matrix):
+        """Add one snapshot, a dense numpy matrix or a scipy.sparse matrix."""
+        if self.total is None:
+            self.total = np.zeros(adj_matrix.shape, dtype=np.int64)
+            self.week_total = np.zeros(adj_matrix.shape, dtype=np.int64)
+        if isinstance(adj_matrix, np.ndarray):
+            self.total += adj_matrix
+            self.week_total += adj_matrix
+        else:
+            coo = adj_matrix.tocoo()
+            np.add.at(self.total, (coo.row, coo.col), coo.data.astype(np.int64))
+            np.add.at(self.week_total, (coo.row, coo.col), coo.data.astype(np.int64))
+        self.count += 1
+
+        if self.count % self.week_size == 0:
+            self.week_averages.append(self.week_total / self.week_size)
+            self.week_total[:] = 0
+
+    def add_counts(self, counts, n_snapshots):
+        """
+        Add n_snapshots snapshots given as their summed (n, n) counts, e.g. from dense_adjacency_stack.
+
+        The snapshots must lie within one week, see week_remaining.
+        """
+        if n_snapshots > self.week_remaining():
+            raise ValueError("The snapshots cross a week boundary")
+        if self.total is None:
+            self.total = np.zeros(counts.shape, dtype=np.int64)
+            self.week_total = np.zeros(counts.shape, dtype=np.int64)
+        self.total += counts
+        self.week_total += counts
+        self.count += n_snapshots
+        if self.count % self.week_size == 0:
+            self.week_averages.append(self.week_total / self.week_size)
+            self.week_total[:] = 0
+
+    def week_remaining(self):
+        """Snapshots still missing to complete the current week."""
+        return self.week_size - self.count % self.week_size
+
+    def get_state(self):
+        """Arrays of the running sums (empty before the first snapshot), for checkpoints."""
+        if self.total is None:
+            return {"count": self.count, "week_size": self.week_size}
+        return {"count": self.count, "week_size": self.week_size, "total": self.total,
+                "week_total": self.week_total, "week_averages": np.array(self.week_averages)}
+
+    def set_state(self, state):
+        self.count = int(state["count"])
+        self.week_size = int(state["week_size"])
+        self.total = np.array(state["total"]) if "total" in state else None
+        self.week_total = np.array(state["week_total"]) if "week_total" in state else None
+        self.week_averages = list(state["week_averages"]) if "week_averages" in state else []
+
+    def average(self):
+        """Average adjacency matrix over all snapshots."""
+        if self.count == 0:
+            raise ValueError("No adjacency snapshots were added")
+        return self.total / self.count
+
+    def to_dataframe(self):
+        """DataFrame with one averaged matrix per complete week plus week-all, like read_all_weeks."""
+        import pandas as pd
+
+        weeks_data = {"names": [f'week-{week}' for week in range(1, len(self.week_averages) + 1)],
+                      "adj_matr": list(self.week_averages)}
+        weeks_data["names"].append('week-all')
+        weeks_data["adj_matr"].append(self.average())
+        return pd.DataFrame(weeks_data)
@@ -1,10 +1,14 @@
-from src.GridObject import GridObject
-from src.Consumable import Consumable
-import random
-
-class Bath(Consumable):
-    def __init__(self, x, y,):
-        super().__init__(x, y, max_amount=-1)
-    
-    def consume(self):
-        return random.randint(100, 250)
+from src.GridObject import GridObject
+from src.Consumable import Consumable
+import random
+
+class Bath(Consumable):
+    clean_range = (100, 250)  # cleanliness gained per bath, never runs out
+
+    def __init__(self, x, y,):
+        super().__init__(x, y, max_amount=-1)
+    
+    def consume(self, rng=None):
+        if rng is not None:
+            return rng.randint(*self.clean_range)
+        return random.randint(*self.clean_range)
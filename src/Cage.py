@@ -1,190 +1,315 @@
-from src.Food import Food
-from src.Water import Water
-from src.Bath import Bath
-import numpy as np
-import pygame
-import cv2
-
-class Cage:
-    def __init__(self, width, height, chickens, food_positions, water_positions, bath_positions):
-        self.width = width
-        self.height = height
-        self.chickens = chickens
-        self.food_sources = [Food(x, y) for x, y in food_positions]
-        self.water_sources = [Water(x, y) for x, y in water_positions]
-        self.bathing_areas = [Bath(x, y) for x, y in bath_positions]
-        
-        for chicken in self.chickens:
-            chicken.set_cage(self)
-        
-        self.all_object_names = [f"chicken_{i}" for i in range(len(self.chickens))] + \
-                [f"food_{i}" for i in range(len(self.food_sources))] +   \
-                [f"water_{i}" for i in range(len(self.water_sources))] + \
-                [f"bath_{i}" for i in range(len(self.bathing_areas))]
-    
-    def is_valid_position(self, x, y):
-        return 0 <= x < self.width and 0 <= y < self.height
-    
-    def update(self):
-        for chicken in self.chickens:
-            chicken.act()
-    
-    def display_printed(self):
-        grid = [['.' for _ in range(self.width)] for _ in range(self.height)]
-        
-        for food in self.food_sources:
-            grid[food.y][food.x] = 'F'
-        for water in self.water_sources:
-            grid[water.y][water.x] = 'W'
-        for bath in self.bathing_areas:
-            grid[bath.y][bath.x] = 'B'
-        for chicken in self.chickens:
-            grid[chicken.y][chicken.x] = 'C'
-        
-        for row in grid:
-            print(" ".join(row))
-        print("\n")
-    
-    def interact(self, x, y):
-        for food in self.food_sources:
-            if food.x == x and food.y == y:
-                return "food", food.consume()
-        for water in self.water_sources:
-            if water.x == x and water.y == y:
-                return "water", water.consume()
-        for bath in self.bathing_areas:
-            if bath.x == x and bath.y == y:
-                return "bath", bath.consume()
-        
-        return None, 0
-    
-    def get_adj_matr(self):
-        # return the current adjacency matrix
-        # so each chicken, consumeable gets the adjacent positions
-        all_objects = self.chickens + self.food_sources + self.water_sources + self.bathing_areas
-        num_objects = len(all_objects)
-        
-        # Initialize the adjacency matrix with zeros
-        adj_matrix = [[0] * num_objects for _ in range(num_objects)]
-        
-        # Helper function to check if two objects are adjacent
-        def is_adjacent(obj1, obj2):
-            return abs(obj1.x - obj2.x) <= 1 and abs(obj1.y - obj2.y) <= 1
-        
-        # Fill the adjacency matrix
-        for i in range(num_objects):
-            for j in range(num_objects):
-                if i != j and is_adjacent(all_objects[i], all_objects[j]):
-                    adj_matrix[i][j] = 1
-        
-        return np.array(adj_matrix)
-
-    def simulate(self, steps, adj_matrix_interval=None, visual=True, burn_in =100):
-        for _ in range(burn_in):
-            self.update()
-        adj_matrices = []
-        for step in range(steps):
-            self.update()
-            if visual:
-                self.display_printed()
-            if adj_matrix_interval and step % adj_matrix_interval == 0:
-                adj_matrices.append(self.get_adj_matr())
-        
-        print("End report:")
-        for chicken in self.chickens:
-            #print the status of each chicken
-            print(f"Chicken {chicken.id} \tFood: {chicken.food} \tWater: {chicken.water} \tClean: {chicken.clean}")
-
-        return adj_matrices
-    
-    
-    def simulate_visual(self, steps, adj_matrix_interval=None, visual=True, burn_in =100, record=True, fps = 3):
-        for _ in range(burn_in):
-            self.update()
-        
-        if visual:
-            pygame.init()
-            self.TILE_SIZE = 64  # or whatever size you want
-            self.screen = pygame.display.set_mode((self.width * self.TILE_SIZE, self.height * self.TILE_SIZE))
-            self.clock = pygame.time.Clock()
-
-            # Load images
-            surf_base = pygame.Surface((self.TILE_SIZE, self.TILE_SIZE))
-            surf_base.fill((255, 255, 255))  # fill it white
-            surf_food = pygame.Surface((self.TILE_SIZE, self.TILE_SIZE))
-            surf_food.fill((200, 100, 100))
-            surf_water = pygame.Surface((self.TILE_SIZE, self.TILE_SIZE))
-            surf_water.fill((0, 0, 255))
-            surf_bath= pygame.Surface((self.TILE_SIZE, self.TILE_SIZE))
-            surf_bath.fill((0, 200, 100))
-            self.IMAGES = {
-                #'.': pygame.Surface((self.TILE_SIZE, self.TILE_SIZE)),  # blank tile
-                #'F': pygame.image.load('food.png'),
-                #'W': pygame.image.load('water.png'),
-                #'B': pygame.image.load('bath.png'),
-                #'C': pygame.image.load('chicken.png'),
-                '.': surf_base,  # White empty
-                'F': surf_food,      # Green food
-                'W': surf_water,      # Blue water
-                'B': surf_bath,    # Yellow bath
-                'C': pygame.image.load('img/chicken_img.jpeg'),      #
-            }
-            for key in self.IMAGES:
-                self.IMAGES[key] = pygame.transform.scale(self.IMAGES[key], (self.TILE_SIZE, self.TILE_SIZE))
-            if record:
-                
-                fourcc = cv2.VideoWriter_fourcc(*'MJPG')  # or 'XVID'
-                video_writer = cv2.VideoWriter('video.avi', fourcc, fps, (self.width * self.TILE_SIZE, self.height * self.TILE_SIZE))
-
-        adj_matrices = []
-        for step in range(steps):
-            self.update()
-            if visual:
-                self.display(fps)
-                if record:
-                        frame = pygame.surfarray.array3d(self.screen)
-                        frame = np.transpose(frame, (1, 0, 2))  # now (height, width, 3)
-                        frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-                        video_writer.write(frame)
-
-            if adj_matrix_interval and step % adj_matrix_interval == 0:
-                adj_matrices.append(self.get_adj_matr())
-        
-        if visual:
-            if record:
-                video_writer.release()
-            pygame.quit()
-        print("End report:")
-        for chicken in self.chickens:
-            #print the status of each chicken
-            print(f"Chicken {chicken.id} \tFood: {chicken.food} \tWater: {chicken.water} \tClean: {chicken.clean}")
-
-        return adj_matrices
-    
-
-    def display(self, fps=3):
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                exit()
-
-        self.screen.fill((0, 0, 0))  # Clear screen
-
-        grid = [['.' for _ in range(self.width)] for _ in range(self.height)]
-
-        for food in self.food_sources:
-            grid[food.y][food.x] = 'F'
-        for water in self.water_sources:
-            grid[water.y][water.x] = 'W'
-        for bath in self.bathing_areas:
-            grid[bath.y][bath.x] = 'B'
-        for chicken in self.chickens:
-            grid[chicken.y][chicken.x] = 'C'
-
-        for y, row in enumerate(grid):
-            for x, cell in enumerate(row):
-                img = self.IMAGES.get(cell, self.IMAGES['.'])
-                self.screen.blit(img, (x * self.TILE_SIZE, y * self.TILE_SIZE))
-
-        pygame.display.flip()
-        self.clock.tick(fps)  # Control FPS
\ No newline at end of file
+from src.Food import Food
+from src.Water import Water
+from src.Bath import Bath
+from src.adjacency import adjacency_matrix
+from src.RandomStream import spawn_streams
+from src.SimulationStats import SimulationStats
+from src.Observer import ObserverGroup, AdjacencyCollector
+from src.Renderer import PygameRenderer, cell_grid, make_renderer
+import numpy as np
+import time
+
+RESOURCE_TYPES = {"food": Food, "water": Water, "bath": Bath}
+
+
+def distance_field(sources, width, height, walls=None):
+    """
+    Distance from every cell to the nearest source, inf where there is none.
+
+    Without walls this is the Manhattan distance used by FollowerChicken. With a boolean
+    (height, width) walls grid it is the shortest path length around the walls (BFS with
+    4-neighbour steps, the moves a chicken can make).
+    """
+    field = np.full((height, width), np.inf)
+    if not sources:
+        return field
+    if walls is None or not walls.any():
+        xs, ys = np.arange(width), np.arange(height)
+        for sx, sy in sources:
+            np.minimum(field, np.abs(ys[:, None] - sy) + np.abs(xs[None, :] - sx), out=field)
+        return field
+
+    frontier = np.zeros((height, width), dtype=bool)
+    for sx, sy in sources:
+        if 0 <= sx < width and 0 <= sy < height and not walls[sy, sx]:
+            frontier[sy, sx] = True
+    distance = 0
+    while frontier.any():
+        field[frontier] = distance
+        grown = np.zeros_like(frontier)
+        grown[1:, :] |= frontier[:-1, :]
+        grown[:-1, :] |= frontier[1:, :]
+        grown[:, 1:] |= frontier[:, :-1]
+        grown[:, :-1] |= frontier[:, 1:]
+        frontier = grown & ~walls & np.isinf(field)
+        distance += 1
+    return field
+
+
+class Cage:
+    def __init__(self, width, height, chickens, food_positions, water_positions, bath_positions,
+                 visit_memory="dense", proximity_radius=1, wall_positions=None, seed=None):
+        self.width = width
+        self.height = height
+        # Cells chickens cannot enter, resource distances are measured around them
+        self.wall_positions = set(wall_positions or [])
+        self.walls = np.zeros((height, width), dtype=bool)
+        for x, y in self.wall_positions:
+            if not (0 <= x < width and 0 <= y < height):
+                raise ValueError(f"Wall ({x}, {y}) is outside the {width}x{height} cage")
+            self.walls[y, x] = True
+        self.proximity_radius = proximity_radius  # Chebyshev distance that counts as adjacent
+        self.visit_memory = visit_memory  # "dense" or "ring", see VisitMemory.make_visit_memory
+        self.food_sources = [Food(x, y) for x, y in food_positions]
+        self.water_sources = [Water(x, y) for x, y in water_positions]
+        self.bathing_areas = [Bath(x, y) for x, y in bath_positions]
+        # With a seed (int or np.random.SeedSequence) every chicken draws from its own RandomStream
+        self.seed = seed
+        # Timing of simulate/simulate_visual, per-phase timing is off unless a stats object enables it
+        self.stats = SimulationStats(enabled=False)
+        self.chickens = chickens  # also builds the spatial index
+        
+        for chicken in self.chickens:
+            chicken.set_cage(self)
+        
+        self.build_object_names()
+
+    def build_object_names(self):
+        self.all_object_names = [f"chicken_{i}" for i in range(len(self.chickens))] + \
+                [f"food_{i}" for i in range(len(self.food_sources))] +   \
+                [f"water_{i}" for i in range(len(self.water_sources))] + \
+                [f"bath_{i}" for i in range(len(self.bathing_areas))]
+    
+    @property
+    def chickens(self):
+        return self._chickens
+
+    @chickens.setter
+    def chickens(self, chickens):
+        self._chickens = chickens
+        if self.seed is not None:
+            for chicken, stream in zip(chickens, spawn_streams(self.seed, len(chickens))):
+                chicken.rng = stream
+        self.build_index()
+
+    def build_index(self):
+        """
+        Build the cell indexed lookup tables.
+
+        resource_grid holds, per cell, the index in self.resources of the resource a chicken
+        interacts with there (-1 for none). occupancy maps a cell (x, y) to the indices of
+        the objects on it, in the order of get_adj_matr (chickens first, then resources).
+        distance_fields holds, per resource type, the distance from every cell to the
+        nearest resource of that type (see distance_field).
+        Call again after adding, removing or moving resources or replacing chickens in place
+        (add_resource, remove_resource and move_resource do this).
+        """
+        self.resources = self.food_sources + self.water_sources + self.bathing_areas
+        for resource in self.resources:
+            self.check_not_wall(resource.x, resource.y)
+        self.resource_kinds = ["food"] * len(self.food_sources) + ["water"] * len(self.water_sources) + \
+            ["bath"] * len(self.bathing_areas)
+        self.resource_grid = np.full((self.height, self.width), -1, dtype=int)
+        # reversed so the first source wins on shared cells (food, then water, then bath)
+        # resources outside the cage can never be reached, so they are left out
+        for i in reversed(range(len(self.resources))):
+            if self.is_valid_position(self.resources[i].x, self.resources[i].y):
+                self.resource_grid[self.resources[i].y, self.resources[i].x] = i
+        self.distance_fields = {
+            kind: distance_field([(r.x, r.y) for r in sources], self.width, self.height, self.walls)
+            for kind, sources in (("food", self.food_sources), ("water", self.water_sources),
+                                  ("bath", self.bathing_areas))
+        }
+        self.build_occupancy()
+
+    def resource_list(self, kind):
+        return {"food": self.food_sources, "water": self.water_sources, "bath": self.bathing_areas}[kind]
+
+    def check_not_wall(self, x, y):
+        if (x, y) in self.wall_positions:
+            raise ValueError(f"Resource at ({x}, {y}) is on a wall")
+
+    def add_resource(self, kind, x, y):
+        """Add a resource of kind "food", "water" or "bath" at (x, y) and return it."""
+        self.check_not_wall(x, y)
+        resource = RESOURCE_TYPES[kind](x, y)
+        self.resource_list(kind).append(resource)
+        self.build_index()
+        self.build_object_names()
+        return resource
+
+    def remove_resource(self, resource):
+        for kind in RESOURCE_TYPES:
+            if resource in self.resource_list(kind):
+                self.resource_list(kind).remove(resource)
+        self.build_index()
+        self.build_object_names()
+
+    def move_resource(self, resource, x, y):
+        self.check_not_wall(x, y)
+        resource.x, resource.y = x, y
+        self.build_index()
+
+    def build_occupancy(self):
+        self.occupancy = {}
+        for i, obj in enumerate(self.chickens + self.resources):
+            self.occupancy.setdefault((obj.x, obj.y), []).append(i)
+
+    def move_occupant(self, index, old_position, new_position):
+        """Move object index from one cell of the occupancy index to another."""
+        cell = self.occupancy[old_position]
+        cell.remove(index)
+        if not cell:
+            del self.occupancy[old_position]
+        self.occupancy.setdefault(new_position, []).append(index)
+
+    def objects_near(self, x, y, radius=1):
+        """Indices of all objects within Chebyshev distance radius of (x, y), including (x, y)."""
+        near = []
+        for nx in range(x - radius, x + radius + 1):
+            for ny in range(y - radius, y + radius + 1):
+                near.extend(self.occupancy.get((nx, ny), ()))
+        return near
+
+    def objects_in_range(self, x, y, radius=1):
+        """Chickens, food, water and baths within radius of (x, y)."""
+        n_chicken = len(self.chickens)
+        in_range = {"chicken": [], "food": [], "water": [], "bath": []}
+        for i in self.objects_near(x, y, radius):
+            if i < n_chicken:
+                in_range["chicken"].append(self.chickens[i])
+            else:
+                in_range[self.resource_kinds[i - n_chicken]].append(self.resources[i - n_chicken])
+        return in_range["chicken"], in_range["food"], in_range["water"], in_range["bath"]
+
+    def is_valid_position(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height and (x, y) not in self.wall_positions
+    
+    def update(self):
+        if self.stats.enabled:
+            self.profiled_update()
+            return
+        for i, chicken in enumerate(self.chickens):
+            old_position = (chicken.x, chicken.y)
+            chicken.act()
+            if (chicken.x, chicken.y) != old_position:
+                self.move_occupant(i, old_position, (chicken.x, chicken.y))
+
+    def profiled_update(self):
+        """update() with chicken.act() split into move and interact, each timed."""
+        stats = self.stats
+        clock = time.perf_counter
+        move_time = interact_time = 0.0
+        for i, chicken in enumerate(self.chickens):
+            old_position = (chicken.x, chicken.y)
+            started = clock()
+            chicken.move()
+            moved = clock()
+            chicken.interact()
+            interacted = clock()
+            if (chicken.x, chicken.y) != old_position:
+                self.move_occupant(i, old_position, (chicken.x, chicken.y))
+            done = clock()
+            move_time += (moved - started) + (done - interacted)
+            interact_time += interacted - moved
+            if stats.per_type:
+                stats.add_type(type(chicken).__name__, done - started)
+        stats.add_time("move", move_time, len(self.chickens))
+        stats.add_time("interact", interact_time, len(self.chickens))
+    
+    def display_printed(self):
+        for row in cell_grid(self):
+            print(" ".join(row))
+        print("\n")
+    
+    def interact(self, x, y, rng=None):
+        resource_idx = self.resource_grid[y, x]
+        if resource_idx == -1:
+            return None, 0
+        kind = self.resource_kinds[resource_idx]
+        if kind == "bath":
+            # the only random resource, drawn from the chicken's own stream if it has one
+            return kind, self.resources[resource_idx].consume(rng=rng)
+        return kind, self.resources[resource_idx].consume()
+    
+    def positions(self):
+        """x and y arrays of all objects, in the order of all_object_names."""
+        all_objects = self.chickens + self.resources
+        return np.array([obj.x for obj in all_objects]), np.array([obj.y for obj in all_objects])
+
+    def get_adj_matr(self, radius=None, fmt="dense"):
+        """
+        Return the current adjacency matrix of chickens and resources.
+
+        Two objects are adjacent within Chebyshev distance radius (default proximity_radius).
+        fmt "dense" gives a boolean numpy matrix, "coo"/"csr" a scipy.sparse matrix.
+        """
+        x, y = self.positions()
+        return adjacency_matrix(x, y, self.proximity_radius if radius is None else radius, fmt)
+
+    def chicken_positions(self):
+        """x and y arrays of the chickens."""
+        return np.array([c.x for c in self.chickens], dtype=int), np.array([c.y for c in self.chickens], dtype=int)
+
+    def need_levels(self):
+        """food, water and clean arrays of the chickens."""
+        return tuple(np.array([getattr(c, need) for c in self.chickens], dtype=float)
+                     for need in ("food", "water", "clean"))
+
+    def start_observers(self, observers, adj_matrix_interval, accumulator, stats, steps):
+        """
+        ObserverGroup of a run: the given observers plus, with adj_matrix_interval, an
+        AdjacencyCollector for the snapshots simulate returns (or adds to accumulator).
+        """
+        adjacency = AdjacencyCollector(adj_matrix_interval, accumulator) if adj_matrix_interval else None
+        events = ObserverGroup(([adjacency] if adjacency else []) + list(observers), stats)
+        events.start(self, steps)
+        return events, adjacency.adj_matrices if adjacency else []
+
+    def simulate(self, steps, adj_matrix_interval=None, visual=True, burn_in =100, accumulator=None, stats=None,
+                 observers=(), report=True, first_step=0, renderer=None):
+        # With an accumulator (e.g. AdjacencyAccumulator) snapshots are added to it instead
+        # of being kept, and the returned list stays empty
+        # stats (SimulationStats) collects the timing report, kept in self.stats
+        # observers (see Observer) collect further outputs, only what they subscribe to is computed
+        # first_step continues a run restored from a checkpoint (see Checkpoint), with burn_in=0
+        # renderer is "none", "terminal", "pygame", "video" or a Renderer, visual=True means "terminal"
+        renderer = make_renderer(renderer if renderer is not None else "terminal" if visual else None)
+        observers = ([renderer] if renderer else []) + list(observers)
+        stats = self.start_stats(stats, burn_in, steps - first_step)
+        events, adj_matrices = self.start_observers(observers, adj_matrix_interval, accumulator, stats, steps)
+        for step in range(first_step, steps):
+            self.update()
+            events.step(self, step)
+            stats.step_done()
+        
+        self.finish_run(events, stats, report)
+        return adj_matrices
+
+    def finish_run(self, events, stats, report):
+        events.finish(self)
+        stats.finish(self.chickens)
+        if report:
+            print(stats.report())
+
+    def start_stats(self, stats, burn_in, steps):
+        """Run the burn-in steps (timed as one phase) and start the clock of stats for the main run."""
+        stats = stats if stats is not None else SimulationStats(enabled=False)
+        self.stats = SimulationStats(enabled=False)  # burn-in steps are not split into phases
+        started = stats.clock()
+        for _ in range(burn_in):
+            self.update()
+        stats.add("burn_in", started, burn_in)
+        self.stats = stats
+        stats.start(steps)
+        return stats
+    
+    
+    def simulate_visual(self, steps, adj_matrix_interval=None, visual=True, burn_in =100, record=True, fps = 3,
+                        accumulator=None, stats=None, observers=(), report=True, first_step=0, renderer=None):
+        """simulate with a pygame window (visual) recorded to video.avi (record), or the given renderer."""
+        if renderer is None and visual:
+            renderer = PygameRenderer(fps=fps, record='video.avi' if record else None)
+        return self.simulate(steps, adj_matrix_interval=adj_matrix_interval, visual=False, burn_in=burn_in,
+                             accumulator=accumulator, stats=stats, observers=observers, report=report,
+                             first_step=first_step, renderer=renderer)
@@ -0,0 +1,259 @@
+import io
+import json
+import os
+import random
+
+import numpy as np
+
+from src.Cage import Cage
+from src.VectorCage import VectorCage, BatchedCage, flock_relations
+from src.Chicken import Chicken, RandomChicken, WeightedRandomChicken, FollowerChicken
+from src.SocialGraph import RELATIONS, SocialGraph, csr_rows
+from src.RandomStream import RandomStream, spawn_streams
+from src.VisitMemory import make_visit_memory
+from src.Observer import Observer
+
+CHECKPOINT_VERSION = 1
+CAGE_TYPES = {cls.__name__: cls for cls in (Cage, VectorCage)}
+CHICKEN_TYPES = {cls.__name__: cls for cls in (RandomChicken, WeightedRandomChicken, FollowerChicken)}
+SOCIAL_PARAMETERS = ("friend_attraction", "enemy_repulsion", "social_distance_factor")
+
+
+def cage_state(cage, step=None, accumulator=None, global_random=True):
+    """
+    Complete state of a cage as (header, arrays).
+
+    header is JSON serializable (layout, chicken types, random stream states), arrays
+    holds everything that scales with the flock or the grid: positions, needs, visit
+    memory, relationships and resource amounts. With global_random the states of the
+    random and np.random modules are included, which unseeded cages draw from.
+    """
+    if isinstance(cage, BatchedCage):
+        raise ValueError("Checkpoint the replicate cages of a BatchedCage instead")
+    flock_random_state = None
+    if isinstance(cage, VectorCage) and cage.x is not None:
+        cage.sync_objects()
+        cage.sync_visits()
+        if cage.flock_random is not None:
+            flock_random_state = cage.flock_random.get_state()
+
+    chickens = cage.chickens
+    header = {
+        "version": CHECKPOINT_VERSION,
+        "step": step,
+        "cage": type(cage).__name__,
+        "width": cage.width,
+        "height": cage.height,
+        "visit_memory": cage.visit_memory,
+        "proximity_radius": cage.proximity_radius,
+        "wall_positions": sorted(cage.wall_positions),
+        "food_positions": [(r.x, r.y) for r in cage.food_sources],
+        "water_positions": [(r.x, r.y) for r in cage.water_sources],
+        "bath_positions": [(r.x, r.y) for r in cage.bathing_areas],
+        "chicken_types": [type(c).__name__ for c in chickens],
+        "id_counter": Chicken._id_counter,
+        "streams": [c.rng.get_state() if c.rng is not None else None for c in chickens],
+        "flock_random": flock_random_state,
+    }
+    if isinstance(cage, VectorCage):
+        header["chunk_size"] = cage.chunk_size
+        header["social_fields"] = cage.social_fields
+    arrays = {
+        "ids": np.array([c.id for c in chickens], dtype=np.int64),
+        "x": np.array([c.x for c in chickens], dtype=np.int64),
+        "y": np.array([c.y for c in chickens], dtype=np.int64),
+        "resource_amounts": np.array([r.current_amount for r in cage.resources], dtype=np.int64),
+        "resource_max": np.array([r.max_amount for r in cage.resources], dtype=np.int64),
+    }
+    for need, levels in zip(("food", "water", "clean"), cage.need_levels()):
+        arrays[need] = levels
+
+    # Visit memories of all chickens that have one, stacked along the chicken axis
+    rows = [i for i, c in enumerate(chickens) if getattr(c, "visits", None) is not None]
+    if rows:
+        memories = [chickens[i].visits for i in rows]
+        header["visit_options"] = memories[0].options()
+        arrays["visits_rows"] = np.array(rows, dtype=np.int64)
+        arrays["visits_now"] = np.array([m.now for m in memories], dtype=np.int64)
+        for key in memories[0].get_state():
+            if key != "now":
+                arrays[f"visits_{key}"] = np.concatenate([m.get_state()[key] for m in memories])
+
+    # Social parameters and relationships of the FollowerChickens, rows in flock order
+    followers = [c for c in chickens if isinstance(c, FollowerChicken)]
+    for name in SOCIAL_PARAMETERS:
+        arrays[name] = np.array([getattr(c, name) for c in followers], dtype=float)
+    header["social"] = any(c.social is not None for c in followers)
+    if header["social"]:
+        for kind, (indptr, indices) in flock_relations(followers).items():
+            arrays[f"{kind}_indptr"] = indptr
+            arrays[f"{kind}_indices"] = indices
+
+    if accumulator is not None:
+        for key, value in accumulator.get_state().items():
+            arrays[f"accumulator_{key}"] = np.asarray(value)
+
+    if global_random:
+        version, python_state, gauss = random.getstate()
+        name, keys, position, has_gauss, cached_gaussian = np.random.get_state()
+        header["python_random"] = [version, gauss]
+        header["numpy_random"] = [name, int(position), int(has_gauss), float(cached_gaussian)]
+        arrays["python_random"] = np.array(python_state, dtype=np.int64)
+        arrays["numpy_random"] = keys
+    return header, arrays
+
+
+def restore_cage(header, arrays, accumulator=None, global_random=True):
+    """Rebuild the cage of cage_state(), see load_checkpoint."""
+    if header["version"] != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version {header['version']}")
+    engine_kwargs = {}
+    if header["cage"] == "VectorCage":
+        engine_kwargs = {"chunk_size": header["chunk_size"], "social_fields": header["social_fields"]}
+    cage = CAGE_TYPES[header["cage"]](
+        width=header["width"], height=header["height"], chickens=[],
+        food_positions=[tuple(p) for p in header["food_positions"]],
+        water_positions=[tuple(p) for p in header["water_positions"]],
+        bath_positions=[tuple(p) for p in header["bath_positions"]],
+        visit_memory=header["visit_memory"], proximity_radius=header["proximity_radius"],
+        wall_positions=[tuple(p) for p in header["wall_positions"]], **engine_kwargs)
+    for resource, amount, max_amount in zip(cage.resources, arrays["resource_amounts"], arrays["resource_max"]):
+        resource.current_amount = int(amount)
+        resource.max_amount = int(max_amount)
+
+    chickens = []
+    for i, name in enumerate(header["chicken_types"]):
+        chicken = CHICKEN_TYPES[name](int(arrays["x"][i]), int(arrays["y"][i]), cage)
+        chicken.id = int(arrays["ids"][i])
+        chicken.food = float(arrays["food"][i])
+        chicken.water = float(arrays["water"][i])
+        chicken.clean = float(arrays["clean"][i])
+        if header["streams"][i] is not None:
+            chicken.rng = RandomStream()
+            chicken.rng.set_state(header["streams"][i])
+        if hasattr(chicken, "visits"):
+            chicken.visits = None
+        chickens.append(chicken)
+    Chicken._id_counter = max(Chicken._id_counter, header["id_counter"])
+
+    if "visits_rows" in arrays:
+        options = dict(header["visit_options"])
+        backend = options.pop("backend")
+        keys = [key[len("visits_"):] for key in arrays if key.startswith("visits_")]
+        for k, row in enumerate(arrays["visits_rows"]):
+            memory = make_visit_memory(1, cage.height, cage.width, backend=backend, **options)
+            state = {key: arrays[f"visits_{key}"][k:k + 1] for key in keys if key not in ("rows", "now")}
+            state["now"] = arrays["visits_now"][k]
+            memory.set_state(state)
+            chickens[row].visits = memory
+
+    followers = [c for c in chickens if isinstance(c, FollowerChicken)]
+    for name in SOCIAL_PARAMETERS:
+        for chicken, value in zip(followers, arrays[name]):
+            setattr(chicken, name, float(value))
+    if header["social"]:
+        graph = SocialGraph(followers)
+        for kind in RELATIONS:
+            graph.set_edges(kind, csr_rows(arrays[f"{kind}_indptr"]), arrays[f"{kind}_indices"])
+
+    cage.chickens = chickens
+    cage.build_object_names()
+    if isinstance(cage, VectorCage):
+        cage.flock_random_state = header["flock_random"]
+
+    if accumulator is not None:
+        accumulator.set_state({key[len("accumulator_"):]: value for key, value in arrays.items()
+                               if key.startswith("accumulator_")})
+    if global_random and "python_random" in arrays:
+        version, gauss = header["python_random"]
+        random.setstate((version, tuple(int(v) for v in arrays["python_random"]), gauss))
+        name, position, has_gauss, cached_gaussian = header["numpy_random"]
+        np.random.set_state((name, arrays["numpy_random"], position, has_gauss, cached_gaussian))
+    return cage
+
+
+def write_checkpoint(file, header, arrays):
+    np.savez_compressed(file, header=np.array(json.dumps(header)), **arrays)
+
+
+def read_checkpoint(source):
+    """(header, arrays) from a checkpoint path or the bytes of checkpoint_bytes()."""
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    with np.load(source, allow_pickle=False) as data:
+        arrays = {key: data[key] for key in data.files}
+    return json.loads(str(arrays.pop("header"))), arrays
+
+
+def save_checkpoint(cage, path, step=None, accumulator=None):
+    """
+    Save the complete state of a cage to a compressed .npz file.
+
+    The file is written next to path first and then renamed, so a crash while saving
+    leaves the previous checkpoint intact.
+
+    Args:
+        step: Last completed step, returned again by load_checkpoint
+        accumulator: AdjacencyAccumulator whose running sums are saved along
+    """
+    header, arrays = cage_state(cage, step=step, accumulator=accumulator)
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        write_checkpoint(f, header, arrays)
+    os.replace(temporary, path)
+
+
+def checkpoint_bytes(cage, step=None, accumulator=None, global_random=True):
+    """The checkpoint of save_checkpoint as bytes, e.g. to send a burned-in cage to other processes."""
+    buffer = io.BytesIO()
+    write_checkpoint(buffer, *cage_state(cage, step=step, accumulator=accumulator, global_random=global_random))
+    return buffer.getvalue()
+
+
+def load_checkpoint(source, accumulator=None, global_random=True):
+    """
+    Restore a cage from a checkpoint path or bytes.
+
+    The restored cage continues exactly like the saved one would have: chicken random
+    streams and (with global_random) the random and np.random states are restored too.
+    Continue with simulate(steps, burn_in=0, first_step=step + 1).
+
+    Args:
+        accumulator: AdjacencyAccumulator that receives the saved running sums
+
+    Returns:
+        tuple: (cage, step) - step as given to save_checkpoint
+    """
+    header, arrays = read_checkpoint(source)
+    return restore_cage(header, arrays, accumulator=accumulator, global_random=global_random), header["step"]
+
+
+def fork_cage(source, seed=None):
+    """
+    Independent copy of a cage (or of checkpoint bytes), e.g. one burn-in shared by many replicates.
+
+    The global random state is left alone. With a seed (int or np.random.SeedSequence)
+    the chickens get new random streams, so forks of the same state diverge; change
+    chicken parameters on the fork for parameter variants.
+    """
+    if isinstance(source, Cage):
+        source = checkpoint_bytes(source, global_random=False)
+    cage, _ = load_checkpoint(source, global_random=False)
+    if seed is not None:
+        cage.seed = seed
+        for chicken, stream in zip(cage.chickens, spawn_streams(seed, len(cage.chickens))):
+            chicken.rng = stream
+        if isinstance(cage, VectorCage):
+            cage.flock_random_state = None
+    return cage
+
+
+class CheckpointWriter(Observer):
+    """Saves a checkpoint every interval steps (crash recovery of long runs), the file is overwritten."""
+    def __init__(self, path, interval=1000, accumulator=None):
+        self.path = path
+        self.step_interval = interval
+        self.accumulator = accumulator  # the AdjacencyAccumulator of the run, saved along
+
+    def on_step(self, cage, step):
+        save_checkpoint(cage, self.path, step=step, accumulator=self.accumulator)
@@ -0,0 +1,219 @@
+import glob
+import json
+import os
+
+import numpy as np
+
+from src.Observer import Observer
+from src.adjacency import adjacency_pairs
+
+META_FILE = "contacts.json"
+CHUNK_PATTERN = "chunk_{:06d}.npz"
+
+
+class ContactLog(Observer):
+    """
+    Writes the contacts of every snapshot as (i, j, step) events to a directory, read back
+    with ContactReader.
+
+    i < j are indices in all_object_names (chickens, then resources), so disk and memory
+    grow with the number of contacts instead of (chickens + resources)^2 per snapshot.
+    Events are buffered and written as columns (i, j, step, plus the steps of the
+    snapshots, which may have no contacts at all) in one compressed file per chunk of
+    at least chunk_size events. Chunk files of an earlier log in the directory are removed,
+    unless append=True: then the log is continued, e.g. after restoring a checkpoint, and
+    the events it holds from the first newly logged step on are replaced.
+    """
+    def __init__(self, path, interval=5, radius=None, chunk_size=1_000_000, append=False):
+        self.path = path
+        self.step_interval = interval
+        self.radius = radius  # None = the cage's proximity_radius
+        self.chunk_size = chunk_size
+        self.append = append
+        self.n_chunks = 0
+        self.resumed = False
+        self.clear_buffer()
+
+    def clear_buffer(self):
+        self.rows, self.cols, self.steps, self.snapshots = [], [], [], []
+        self.buffered = 0
+
+    def on_start(self, cage, steps):
+        os.makedirs(self.path, exist_ok=True)
+        self.clear_buffer()
+        self.radius_used = cage.proximity_radius if self.radius is None else self.radius
+        meta = {"n_objects": len(cage.all_object_names), "n_chicken": len(cage.chickens),
+                "object_names": cage.all_object_names, "interval": self.step_interval, "radius": self.radius_used}
+        meta_path = os.path.join(self.path, META_FILE)
+        if self.append and os.path.exists(meta_path):
+            with open(meta_path) as f:
+                old_meta = json.load(f)
+            if any(old_meta[key] != meta[key] for key in ("n_objects", "interval", "radius")):
+                raise ValueError("The contact log was written for another flock or interval")
+            self.n_chunks = len(chunk_files(self.path))
+            self.resumed = True
+            return
+        for old_chunk in chunk_files(self.path):
+            os.remove(old_chunk)
+        self.n_chunks = 0
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+
+    def truncate(self, step):
+        """Drop the events and snapshots of step and later ones from a continued log."""
+        for file in reversed(chunk_files(self.path)):
+            with np.load(file) as data:
+                chunk = {key: data[key] for key in data.files}
+            if len(chunk["snapshots"]) and chunk["snapshots"].max() < step:
+                break
+            keep = chunk["step"] < step
+            snapshots = chunk["snapshots"][chunk["snapshots"] < step]
+            os.remove(file)
+            if len(snapshots):
+                np.savez_compressed(file, i=chunk["i"][keep], j=chunk["j"][keep], step=chunk["step"][keep],
+                                    snapshots=snapshots)
+                break
+            self.n_chunks -= 1
+
+    def on_step(self, cage, step):
+        if self.resumed:
+            self.truncate(step)
+            self.resumed = False
+        x, y = cage.positions()
+        rows, cols = adjacency_pairs(x, y, self.radius_used)
+        upper = rows < cols
+        self.rows.append(rows[upper].astype(np.int32))
+        self.cols.append(cols[upper].astype(np.int32))
+        self.steps.append(np.full(upper.sum(), step, dtype=np.int64))
+        self.snapshots.append(step)
+        self.buffered += len(self.rows[-1])
+        if self.buffered >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.snapshots:
+            return
+        np.savez_compressed(os.path.join(self.path, CHUNK_PATTERN.format(self.n_chunks)),
+                            i=np.concatenate(self.rows), j=np.concatenate(self.cols), step=np.concatenate(self.steps),
+                            snapshots=np.array(self.snapshots, dtype=np.int64))
+        self.n_chunks += 1
+        self.clear_buffer()
+
+    def on_finish(self, cage):
+        self.flush()
+
+
+class ContactReader:
+    """
+    Contact events of a ContactLog directory, with the averaged and weekly adjacency
+    matrices rebuilt from them (the same as calculate_avg_adj_list and read_all_weeks of
+    the dense snapshots). Chunks are read one at a time.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.n = self.meta["n_objects"]
+        self.object_names = self.meta["object_names"]
+        self.files = chunk_files(path)
+
+    def chunks(self):
+        """Yields (i, j, step, snapshot steps) of every chunk."""
+        for file in self.files:
+            with np.load(file) as data:
+                yield data["i"], data["j"], data["step"], data["snapshots"]
+
+    @property
+    def snapshot_steps(self):
+        steps = []
+        for file in self.files:
+            with np.load(file) as data:
+                steps.append(data["snapshots"])
+        return np.concatenate(steps) if steps else np.empty(0, dtype=np.int64)
+
+    def events(self, first_step=None, last_step=None):
+        """(i, j, step) arrays of the contacts in the steps first_step to last_step (inclusive)."""
+        columns = [[], [], []]
+        for i, j, step, _ in self.chunks():
+            keep = in_window(step, first_step, last_step)
+            for column, values in zip(columns, (i, j, step)):
+                column.append(values[keep])
+        return tuple(np.concatenate(column) if column else np.empty(0, dtype=np.int64) for column in columns)
+
+    def matrix(self, i, j, fmt="dense"):
+        """Symmetric (n, n) matrix of the number of contacts (i, j), i < j, of every pair."""
+        if fmt == "dense":
+            upper = np.bincount(np.asarray(i, dtype=np.int64) * self.n + j,
+                                minlength=self.n * self.n).reshape(self.n, self.n)
+            return upper + upper.T
+        from scipy import sparse  # only needed for sparse matrices
+
+        upper = sparse.coo_matrix((np.ones(len(i), dtype=np.int64), (i, j)), shape=(self.n, self.n)).tocsr()
+        return (upper + upper.T).tocsr() if fmt == "csr" else (upper + upper.T).tocoo()
+
+    def counts(self, first_step=None, last_step=None, fmt="dense"):
+        """
+        Number of snapshots in which each pair was adjacent.
+
+        Returns:
+            tuple: (counts, n_snapshots) - counts as a dense matrix or scipy.sparse (fmt "coo"/"csr")
+        """
+        total = None
+        n_snapshots = 0
+        for i, j, step, snapshots in self.chunks():
+            keep = in_window(step, first_step, last_step)
+            chunk = self.matrix(i[keep], j[keep], fmt)
+            total = chunk if total is None else total + chunk
+            n_snapshots += int(in_window(snapshots, first_step, last_step).sum())
+        if total is None:
+            total = self.matrix(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), fmt)
+        return total, n_snapshots
+
+    def average(self, first_step=None, last_step=None, fmt="dense"):
+        """Average adjacency matrix over the snapshots in the window."""
+        counts, n_snapshots = self.counts(first_step, last_step, fmt)
+        if n_snapshots == 0:
+            raise ValueError("No adjacency snapshots in the window")
+        return counts / n_snapshots
+
+    def week_averages(self, week_size=5, fmt="dense"):
+        """Averages of the complete weeks of week_size snapshots, summed chunk by chunk."""
+        snapshots = self.snapshot_steps
+        n_weeks = len(snapshots) // week_size
+        if n_weeks == 0:
+            return []
+        last_step = snapshots[n_weeks * week_size - 1]
+        weeks = [None] * n_weeks
+        for i, j, step, _ in self.chunks():
+            keep = step <= last_step
+            i, j, step = i[keep], j[keep], step[keep]
+            week = np.searchsorted(snapshots, step) // week_size
+            order = np.argsort(week, kind="stable")
+            bounds = np.searchsorted(week[order], np.arange(n_weeks + 1))
+            for w, (a, b) in enumerate(zip(bounds[:-1], bounds[1:])):
+                if b > a:
+                    counts = self.matrix(i[order[a:b]], j[order[a:b]], fmt)
+                    weeks[w] = counts if weeks[w] is None else weeks[w] + counts
+        empty = np.empty(0, dtype=np.int64)
+        return [(self.matrix(empty, empty, fmt) if counts is None else counts) / week_size for counts in weeks]
+
+    def to_dataframe(self, week_size=5):
+        """DataFrame with one averaged matrix per complete week plus week-all, like read_all_weeks."""
+        import pandas as pd
+
+        weeks = self.week_averages(week_size)
+        return pd.DataFrame({"names": [f'week-{week}' for week in range(1, len(weeks) + 1)] + ['week-all'],
+                             "adj_matr": weeks + [self.average()]})
+
+
+def chunk_files(path):
+    return sorted(glob.glob(os.path.join(path, "chunk_*.npz")))
+
+
+def in_window(steps, first_step=None, last_step=None):
+    keep = np.ones(len(steps), dtype=bool)
+    if first_step is not None:
+        keep &= steps >= first_step
+    if last_step is not None:
+        keep &= steps <= last_step
+    return keep
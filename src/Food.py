@@ -1,9 +1,11 @@
-from src.GridObject import GridObject
-from src.Consumable import Consumable
-
-class Food(Consumable):
-    def __init__(self, x, y, max_amount=1000000):
-        super().__init__(x, y, max_amount)
-
-    def consume(self, amount=25):
-        return super().consume(amount)
\ No newline at end of file
+from src.GridObject import GridObject
+from src.Consumable import Consumable
+
+class Food(Consumable):
+    consume_amount = 25  # eaten per visit
+
+    def __init__(self, x, y, max_amount=1000000):
+        super().__init__(x, y, max_amount)
+
+    def consume(self, amount=None):
+        return super().consume(self.consume_amount if amount is None else amount)
\ No newline at end of file
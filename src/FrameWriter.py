@@ -0,0 +1,77 @@
+import queue
+import threading
+
+import numpy as np
+
+
+class FrameWriter:
+    """
+    Encodes video frames on a background thread.
+
+    Frames are (height, width, 3) BGR uint8 buffers out of a pool of queue_size
+    buffers: the simulation fills a free buffer (buffer()), hands it over (submit())
+    and only waits when all buffers are still queued for encoding. Frames are resized
+    to output_size (width, height) on the writer thread if it differs from frame_size.
+    """
+    def __init__(self, path, fps, frame_size, codec="MJPG", output_size=None, queue_size=8):
+        import cv2
+
+        width, height = frame_size
+        self.frame_size = (width, height)
+        self.output_size = tuple(output_size) if output_size else self.frame_size
+        self.buffers = np.zeros((queue_size, height, width, 3), dtype=np.uint8)
+        self.free = queue.Queue()
+        for index in range(queue_size):
+            self.free.put(index)
+        self.pending = queue.Queue()
+        self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, self.output_size)
+        if not self.writer.isOpened():
+            raise ValueError(f"Cannot write video {path} with codec {codec}")
+        self.error = None
+        self.frames = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def buffer(self):
+        """(index, array) of a free frame buffer, waits while all buffers are queued."""
+        self.check()
+        index = self.free.get()
+        return index, self.buffers[index]
+
+    def submit(self, index):
+        self.pending.put(index)
+        self.frames += 1
+
+    def write(self, frame):
+        """Copy frame into a free buffer and queue it."""
+        index, buffer = self.buffer()
+        np.copyto(buffer, frame)
+        self.submit(index)
+
+    def run(self):
+        import cv2
+
+        while True:
+            index = self.pending.get()
+            if index is None:
+                break
+            if self.error is None:
+                try:
+                    frame = self.buffers[index]
+                    if self.output_size != self.frame_size:
+                        frame = cv2.resize(frame, self.output_size, interpolation=cv2.INTER_AREA)
+                    self.writer.write(frame)
+                except Exception as error:
+                    self.error = error
+            self.free.put(index)
+
+    def check(self):
+        if self.error is not None:
+            raise RuntimeError("Writing the video failed") from self.error
+
+    def close(self):
+        """Encode the queued frames and close the file."""
+        self.pending.put(None)
+        self.thread.join()
+        self.writer.release()
+        self.check()
@@ -1,6 +1,6 @@
-from abc import ABC
-
-class GridObject(ABC):
-    def __init__(self, x, y):
-        self.x = x
+from abc import ABC
+
+class GridObject(ABC):
+    def __init__(self, x, y):
+        self.x = x
         self.y = y
\ No newline at end of file
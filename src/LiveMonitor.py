@@ -0,0 +1,273 @@
+import asyncio
+import base64
+import hashlib
+import json
+import threading
+import time
+
+import numpy as np
+
+from src.Observer import Observer
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+PAGE = """<!DOCTYPE html>
+<html><head><title>Chicken simulation</title></head>
+<body style="font-family: monospace">
+<canvas id="cage" style="border: 1px solid #888; image-rendering: pixelated"></canvas>
+<pre id="state">waiting for the simulation...</pre>
+<script>
+const canvas = document.getElementById("cage"), text = document.getElementById("state");
+const socket = new WebSocket(`ws://${location.host}/ws`);
+socket.onmessage = (event) => {
+  const state = JSON.parse(event.data), tile = 16, ctx = canvas.getContext("2d");
+  canvas.width = state.width * tile; canvas.height = state.height * tile;
+  ctx.fillStyle = "#c86464";
+  state.x.forEach((x, i) => ctx.fillRect(x * tile + 2, state.y[i] * tile + 2, tile - 4, tile - 4));
+  delete state.x; delete state.y;
+  text.textContent = JSON.stringify(state, null, 1);
+};
+socket.onclose = () => { text.textContent += "\\nconnection closed"; };
+</script></body></html>
+"""
+
+
+class LiveMonitor(Observer):
+    """
+    Local HTTP/WebSocket server that publishes the state of a running simulation.
+
+    Every interval steps (at most max_rate messages per second) the chicken positions,
+    the mean and minimum need levels, steps per second, ETA and, with snapshot_interval,
+    the strongest pairs of the running average adjacency (chickens only) are sent as JSON
+    to the connected WebSocket clients (ws://host:port/ws). GET / serves a small page
+    that draws the cage, GET /state the last message.
+
+    The server runs its own asyncio loop on a background thread. The simulation only
+    hands the message over, each client has a queue of queue_size messages and the
+    oldest message is dropped when a client does not keep up, so slow or missing
+    clients never stall the run. Nothing is built while no client is connected.
+    port=0 picks a free port (see url).
+    """
+    def __init__(self, host="127.0.0.1", port=8765, interval=10, snapshot_interval=None, radius=None,
+                 max_rate=10, top_pairs=20, queue_size=4):
+        self.host = host
+        self.port = port
+        self.step_interval = interval
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_radius = radius
+        self.max_rate = max_rate
+        self.top_pairs = top_pairs
+        self.queue_size = queue_size
+        self.loop = None
+        self.thread = None
+        self.clients = {}  # writer: queue of messages, on the server thread
+        self.connections = set()
+        self.error = None
+        self.last_message = None
+        self.last_sent = 0.0
+        self.sent = 0
+        self.dropped = 0
+        self.adjacency_sum = None
+        self.n_snapshots = 0
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/"
+
+    def on_start(self, cage, steps):
+        self.n_chicken = len(cage.chickens)
+        self.adjacency_sum = None
+        self.n_snapshots = 0
+        self.step = None
+        if self.thread is None:
+            self.start()
+
+    def start(self):
+        """Start the server thread and wait until it is listening."""
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(ready,), daemon=True)
+        self.thread.start()
+        ready.wait()
+        if self.error is not None:
+            self.thread = None
+            raise RuntimeError(f"Cannot start the monitor on {self.host}:{self.port}") from self.error
+
+    def run(self, ready):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.serve(ready))
+        self.loop.close()
+
+    async def serve(self, ready):
+        try:
+            server = await asyncio.start_server(self.handle, self.host, self.port)
+        except OSError as error:
+            self.error = error
+            ready.set()
+            return
+        self.port = server.sockets[0].getsockname()[1]
+        self.stopped = asyncio.Event()
+        ready.set()
+        async with server:
+            await self.stopped.wait()
+        for writer in list(self.clients):
+            writer.transport.abort()  # clients that did not take their messages in time
+        await asyncio.gather(*self.connections, return_exceptions=True)
+
+    def on_snapshot(self, cage, step, adj_matrix):
+        chickens = adj_matrix[:self.n_chicken, :self.n_chicken]
+        if not isinstance(chickens, np.ndarray):
+            chickens = chickens.toarray()
+        if self.adjacency_sum is None:
+            self.adjacency_sum = np.zeros((self.n_chicken, self.n_chicken), dtype=np.int64)
+        self.adjacency_sum += chickens
+        self.n_snapshots += 1
+
+    def on_step(self, cage, step):
+        now = time.perf_counter()
+        if not self.clients or now - self.last_sent < 1 / self.max_rate:
+            return
+        self.last_sent = now
+        self.publish(self.message(cage, step))
+        self.step = step
+
+    def message(self, cage, step):
+        stats = cage.stats
+        x, y = cage.chicken_positions()
+        levels = np.stack(cage.need_levels())
+        message = {"step": step, "steps_done": stats.steps, "total_steps": stats.total_steps,
+                   "steps_per_second": round(stats.throughput(), 1), "eta": round(stats.eta(), 1),
+                   "width": cage.width, "height": cage.height, "x": x.tolist(), "y": y.tolist(),
+                   "needs": {need: {"mean": round(float(levels[k].mean()), 1), "min": round(float(levels[k].min()), 1)}
+                             for k, need in enumerate(("food", "water", "clean"))},
+                   "dropped": self.dropped}
+        if self.n_snapshots:
+            average = self.adjacency_sum / self.n_snapshots
+            rows, cols = np.triu_indices(self.n_chicken, k=1)
+            strongest = np.argsort(average[rows, cols])[::-1][:self.top_pairs]
+            message["snapshots"] = self.n_snapshots
+            message["mean_adjacency"] = round(float(average[rows, cols].mean()), 4) if len(rows) else 0.0
+            message["top_pairs"] = [[int(rows[k]), int(cols[k]), round(float(average[rows[k], cols[k]]), 4)]
+                                    for k in strongest]
+        return message
+
+    def publish(self, message):
+        """Hand a message over to the server thread, returns immediately."""
+        self.loop.call_soon_threadsafe(self.broadcast, json.dumps(message))
+
+    def broadcast(self, text):
+        self.last_message = text
+        for queue in self.clients.values():
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(text)
+
+    def on_finish(self, cage):
+        if self.clients:
+            self.publish({**self.message(cage, self.step), "finished": True})
+        self.close()
+
+    def close(self):
+        """Send the queued messages, then stop the server."""
+        if self.thread is None:
+            return
+        self.loop.call_soon_threadsafe(self.loop.create_task, self.shutdown())
+        self.thread.join()
+        self.thread = None
+
+    async def shutdown(self, timeout=1.0):
+        """Close the client connections after their queued messages (waiting at most timeout s), stop the server."""
+        for queue in list(self.clients.values()):
+            try:
+                await asyncio.wait_for(queue.put(None), timeout)
+            except asyncio.TimeoutError:
+                queue.get_nowait()
+                queue.put_nowait(None)
+        deadline = time.perf_counter() + timeout
+        while self.clients and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+        self.stopped.set()
+
+    async def handle(self, reader, writer):
+        self.connections.add(asyncio.current_task())
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+            lines = request.decode("latin-1").split("\r\n")
+            path = lines[0].split(" ")[1] if len(lines[0].split(" ")) > 1 else "/"
+            headers = {k.strip().lower(): v.strip() for k, _, v in (line.partition(":") for line in lines[1:] if line)}
+            if path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                await self.serve_websocket(reader, writer, headers["sec-websocket-key"])
+            elif path == "/":
+                await self.respond(writer, "200 OK", "text/html", PAGE.encode())
+            elif path == "/state":
+                await self.respond(writer, "200 OK", "application/json", (self.last_message or "{}").encode())
+            else:
+                await self.respond(writer, "404 Not Found", "text/plain", b"not found")
+        except (asyncio.IncompleteReadError, ConnectionError, KeyError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+            self.connections.discard(asyncio.current_task())
+
+    async def respond(self, writer, status, content_type, body):
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                     f"Connection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+
+    async def serve_websocket(self, reader, writer, key):
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        writer.write(f"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode())
+        await writer.drain()
+        queue = asyncio.Queue(self.queue_size)
+        if self.last_message is not None:
+            queue.put_nowait(self.last_message)
+        self.clients[writer] = queue
+        listener = asyncio.ensure_future(read_until_close(reader))
+        try:
+            while True:
+                getter = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({getter, listener}, return_when=asyncio.FIRST_COMPLETED)
+                if listener in done:
+                    getter.cancel()
+                    break
+                text = getter.result()
+                if text is None:
+                    writer.write(websocket_frame(b"", opcode=0x8))
+                    await writer.drain()
+                    break
+                writer.write(websocket_frame(text.encode()))
+                await writer.drain()
+                self.sent += 1
+        finally:
+            listener.cancel()
+            del self.clients[writer]
+
+
+def websocket_frame(payload, opcode=0x1):
+    """Unmasked server frame (text by default) with the payload."""
+    length = len(payload)
+    if length < 126:
+        header = bytes([0x80 | opcode, length])
+    elif length < 2 ** 16:
+        header = bytes([0x80 | opcode, 126]) + length.to_bytes(2, "big")
+    else:
+        header = bytes([0x80 | opcode, 127]) + length.to_bytes(8, "big")
+    return header + payload
+
+
+async def read_until_close(reader):
+    """Read and discard the client's frames until it closes the connection."""
+    try:
+        while True:
+            first, second = await reader.readexactly(2)
+            length = second & 0x7F
+            if length == 126:
+                length = int.from_bytes(await reader.readexactly(2), "big")
+            elif length == 127:
+                length = int.from_bytes(await reader.readexactly(8), "big")
+            await reader.readexactly(length + (4 if second & 0x80 else 0))
+            if first & 0x0F == 0x8:
+                return
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return
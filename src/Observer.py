@@ -0,0 +1,157 @@
+import numpy as np
+
+
+class Observer:
+    """
+    Base class of the collectors that subscribe to the events of Cage.simulate.
+
+    on_snapshot is called with the adjacency matrix (radius snapshot_radius, format
+    snapshot_format) after every step divisible by snapshot_interval, then on_step
+    after every step divisible by step_interval. An interval of None means the event is
+    not wanted, so a run only computes what its observers need. Steps count from 0
+    after burn-in.
+    """
+    step_interval = None
+    snapshot_interval = None
+    snapshot_radius = None  # None = the cage's proximity_radius
+    snapshot_format = "dense"
+
+    def on_start(self, cage, steps):
+        pass
+
+    def on_step(self, cage, step):
+        pass
+
+    def on_snapshot(self, cage, step, adj_matrix):
+        pass
+
+    def on_finish(self, cage):
+        pass
+
+
+class ObserverGroup:
+    """Dispatches the events of one run to its observers, snapshots are computed once per format."""
+    def __init__(self, observers, stats):
+        self.observers = list(observers)
+        self.stats = stats
+        self.step_observers = [o for o in self.observers if o.step_interval]
+        self.snapshot_observers = [o for o in self.observers if o.snapshot_interval]
+
+    def start(self, cage, steps):
+        for observer in self.observers:
+            observer.on_start(cage, steps)
+
+    def step(self, cage, step):
+        if self.snapshot_observers:
+            started = self.stats.clock()
+            snapshots = {}
+            for observer in self.snapshot_observers:
+                if step % observer.snapshot_interval == 0:
+                    key = (observer.snapshot_radius, observer.snapshot_format)
+                    if key not in snapshots:
+                        snapshots[key] = cage.get_adj_matr(radius=key[0], fmt=key[1])
+                    observer.on_snapshot(cage, step, snapshots[key])
+            if snapshots:
+                self.stats.add("snapshot", started)
+        for observer in self.step_observers:
+            if step % observer.step_interval == 0:
+                observer.on_step(cage, step)
+
+    def finish(self, cage):
+        for observer in self.observers:
+            observer.on_finish(cage)
+
+
+class AdjacencyCollector(Observer):
+    """Adjacency snapshots every interval steps, kept in adj_matrices or added to an accumulator."""
+    def __init__(self, interval, accumulator=None, radius=None, fmt="dense"):
+        self.snapshot_interval = interval
+        self.snapshot_radius = radius
+        self.snapshot_format = fmt
+        self.accumulator = accumulator  # e.g. an AdjacencyAccumulator, then adj_matrices stays empty
+        self.adj_matrices = []
+
+    def on_snapshot(self, cage, step, adj_matrix):
+        if self.accumulator is not None:
+            self.accumulator.add(adj_matrix)
+        else:
+            self.adj_matrices.append(adj_matrix)
+
+
+class NeedSeries(Observer):
+    """
+    Time series of the need levels (food, water, clean) every interval steps.
+
+    By default only the flock means are kept, per_chicken keeps every chicken's levels.
+    """
+    def __init__(self, interval=1, per_chicken=False):
+        self.step_interval = interval
+        self.per_chicken = per_chicken
+        self.steps = []
+        self.levels = []
+
+    def on_step(self, cage, step):
+        levels = np.stack(cage.need_levels(), axis=-1)  # (chickens, 3)
+        self.steps.append(step)
+        self.levels.append(levels.astype(np.float32) if self.per_chicken else levels.mean(axis=0))
+
+    def as_array(self):
+        """(steps, 3) means or (steps, chickens, 3) levels, columns food, water, clean."""
+        return np.array(self.levels)
+
+    def to_dataframe(self):
+        """Flock mean levels per recorded step."""
+        import pandas as pd
+
+        levels = self.as_array()
+        if self.per_chicken:
+            levels = levels.mean(axis=1)
+        return pd.DataFrame(levels.reshape(-1, 3), index=self.steps, columns=["food", "water", "clean"])
+
+
+class ResourceUsage(Observer):
+    """
+    Number of chicken steps spent on every resource (each one is an interaction), and the
+    amounts left at the end.
+    """
+    def __init__(self, interval=1):
+        self.step_interval = interval
+        self.visits = None
+        self.remaining = None
+
+    def on_start(self, cage, steps):
+        self.visits = np.zeros(len(cage.resources), dtype=np.int64)
+
+    def on_step(self, cage, step):
+        x, y = cage.chicken_positions()
+        resource_idx = cage.resource_grid[y, x]
+        self.visits += np.bincount(resource_idx[resource_idx != -1], minlength=len(self.visits))
+
+    def on_finish(self, cage):
+        self.remaining = np.array([resource.current_amount for resource in cage.resources])
+
+    def by_kind(self, cage):
+        """Total visits per resource type."""
+        totals = {}
+        for kind, visits in zip(cage.resource_kinds, self.visits):
+            totals[kind] = totals.get(kind, 0) + int(visits)
+        return totals
+
+
+class PositionLogger(Observer):
+    """Chicken positions every interval steps, as int16 arrays."""
+    def __init__(self, interval=1):
+        self.step_interval = interval
+        self.steps = []
+        self.xs = []
+        self.ys = []
+
+    def on_step(self, cage, step):
+        x, y = cage.chicken_positions()
+        self.steps.append(step)
+        self.xs.append(np.asarray(x, dtype=np.int16))
+        self.ys.append(np.asarray(y, dtype=np.int16))
+
+    def positions(self):
+        """x and y arrays of shape (recorded steps, chickens)."""
+        return np.array(self.xs), np.array(self.ys)
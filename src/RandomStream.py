@@ -0,0 +1,134 @@
+import numpy as np
+
+
+class RandomStream:
+    """
+    Reproducible random stream of one chicken.
+
+    Uniforms are drawn from its own numpy Generator in blocks of block_size, so a
+    draw is a list lookup instead of a call into numpy, and changing what one chicken
+    does never shifts the random numbers of another one.
+
+    The stream remembers the generator state before its current block (anchor) and
+    how many uniforms it used since (offset), which is all get_state() needs to
+    continue it exactly without storing the block.
+    """
+    def __init__(self, seed=None, block_size=1024):
+        self.generator = np.random.default_rng(seed)
+        self.block_size = block_size
+        self.block = []
+        self.position = 0
+        self.anchor = self.generator.bit_generator.state
+        self.offset = 0
+
+    def random(self):
+        """Next uniform in [0, 1)."""
+        if self.position == len(self.block):
+            self.anchor = self.generator.bit_generator.state
+            self.offset = 0
+            self.block = self.generator.random(self.block_size).tolist()
+            self.position = 0
+        u = self.block[self.position]
+        self.position += 1
+        self.offset += 1
+        return u
+
+    def take(self, n):
+        """Next n uniforms as an array, continuing the same stream as random()."""
+        self.offset += n
+        rest = len(self.block) - self.position
+        if n <= rest:
+            self.position += n
+            return np.array(self.block[self.position - n:self.position])
+        u = np.concatenate([self.block[self.position:], self.generator.random(n - rest)])
+        self.block = []
+        self.position = 0
+        return u
+
+    def get_state(self):
+        """JSON serializable state, set_state() of any stream continues with the same uniforms."""
+        return {"anchor": self.anchor, "offset": self.offset, "block_size": self.block_size}
+
+    def set_state(self, state):
+        self.block_size = state["block_size"]
+        self.generator.bit_generator.state = state["anchor"]
+        self.generator.random(state["offset"])
+        self.anchor = self.generator.bit_generator.state
+        self.offset = 0
+        self.block = []
+        self.position = 0
+
+    def randrange(self, n):
+        """Random integer in [0, n)."""
+        return min(int(self.random() * n), n - 1)
+
+    def randint(self, a, b):
+        """Random integer in [a, b], like random.randint."""
+        return a + self.randrange(b - a + 1)
+
+    def choice_index(self, weights):
+        """Index sampled with probability proportional to weights (cumulative search)."""
+        u = self.random() * sum(weights)
+        cumulative = 0
+        last = 0
+        for i, weight in enumerate(weights):
+            if weight > 0:
+                cumulative += weight
+                last = i
+                if u < cumulative:
+                    return i
+        return last
+
+
+class FlockRandom:
+    """
+    Bulk draws for many streams: one uniform per stream and step, in blocks of block_size steps.
+
+    Refilling loops over the streams once per block, every other step is an array slice.
+    The stream states before the refill (anchors) are kept so get_state() can rebuild
+    the block instead of storing it.
+    """
+    def __init__(self, streams, block_size=256):
+        self.streams = streams
+        self.block_size = block_size
+        self.block = np.empty((len(streams), 0))
+        self.position = 0
+        self.anchors = []
+
+    def next(self):
+        """One uniform per stream, as an array in stream order."""
+        if self.position == self.block.shape[1]:
+            self.anchors = [s.get_state() for s in self.streams]
+            self.block = np.stack([s.take(self.block_size) for s in self.streams]) if self.streams else \
+                np.empty((0, self.block_size))
+            self.position = 0
+        u = self.block[:, self.position]
+        self.position += 1
+        return u
+
+    def get_state(self):
+        return {"anchors": self.anchors, "position": self.position, "width": self.block.shape[1]}
+
+    def set_state(self, state):
+        """Rebuild the block of get_state(), the streams themselves are restored separately."""
+        self.anchors = state["anchors"]
+        self.position = state["position"]
+        self.block = np.empty((len(self.streams), state["width"]))
+        for row, anchor in enumerate(self.anchors):
+            stream = RandomStream()
+            stream.set_state(anchor)
+            self.block[row] = stream.take(state["width"])
+
+
+def spawn_streams(seed, n, block_size=1024):
+    """
+    n independent streams derived from one seed (int or np.random.SeedSequence).
+
+    Stream i is the i-th child of the seed, like seed.spawn(n)[i], but the seed
+    sequence is not advanced, so the same seed always gives the same streams.
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return [RandomStream(np.random.SeedSequence(seed.entropy, spawn_key=seed.spawn_key + (i,),
+                                                pool_size=seed.pool_size), block_size)
+            for i in range(n)]
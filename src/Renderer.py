@@ -0,0 +1,381 @@
+import numpy as np
+
+from src.Observer import Observer
+from src.FrameWriter import FrameWriter
+from src.adjacency import adjacency_pairs
+
+# Tile colours of the cell characters of cell_grid, 'C' is the chicken image
+TILE_COLOURS = {'.': (255, 255, 255), 'F': (200, 100, 100), 'W': (0, 0, 255), 'B': (0, 200, 100), '#': (90, 90, 90)}
+CHICKEN_IMAGE = 'img/chicken_img.jpeg'
+# Drawn on top of the tiles: lines between adjacent chickens, bars of the need levels
+OVERLAYS = ("adjacency", "needs")
+ADJACENCY_COLOUR = (255, 140, 0)
+NEED_COLOURS = ((200, 100, 100), (0, 0, 255), (0, 200, 100))  # food, water, clean
+
+
+def cell_grid(cage):
+    """Character grid of the cage: '.' floor, '#' wall, 'F' food, 'W' water, 'B' bath, 'C' chicken."""
+    grid = [['.' for _ in range(cage.width)] for _ in range(cage.height)]
+    for x, y in cage.wall_positions:
+        grid[y][x] = '#'
+    for food in cage.food_sources:
+        grid[food.y][food.x] = 'F'
+    for water in cage.water_sources:
+        grid[water.y][water.x] = 'W'
+    for bath in cage.bathing_areas:
+        grid[bath.y][bath.x] = 'B'
+    for x, y in zip(*cage.chicken_positions()):
+        grid[y][x] = 'C'
+    return grid
+
+
+def chicken_counts(cage):
+    """(height, width) number of chickens on every cell."""
+    counts = np.zeros((cage.height, cage.width), dtype=int)
+    x, y = cage.chicken_positions()
+    np.add.at(counts, (y, x), 1)
+    return counts
+
+
+def static_cells(cage):
+    """(x, y, cell) of the walls and resources, in the order of cell_grid (the last one shows on a shared cell)."""
+    return [(x, y, '#') for x, y in cage.wall_positions] + \
+        [(r.x, r.y, cell) for sources, cell in ((cage.food_sources, 'F'), (cage.water_sources, 'W'),
+                                                (cage.bathing_areas, 'B')) for r in sources]
+
+
+def overlay_shapes(cage, overlays, tile_size):
+    """
+    Shapes of the overlays in pixels, ("line", start, end, colour) or ("rect", (x, y, w, h), colour).
+
+    "adjacency" connects the chickens within the cage's proximity_radius, "needs" draws
+    a food, water and clean bar (full at level 100) at the bottom of every chicken's
+    cell, averaged over the chickens on the cell.
+    """
+    for overlay in overlays:
+        if overlay not in OVERLAYS:
+            raise ValueError(f"Unknown overlay {overlay}")
+    shapes = []
+    x, y = (np.asarray(a, dtype=int) for a in cage.chicken_positions())
+    centre_x, centre_y = x * tile_size + tile_size // 2, y * tile_size + tile_size // 2
+    if "adjacency" in overlays:
+        rows, cols = adjacency_pairs(x, y, cage.proximity_radius)
+        keep = (rows < cols) & ((x[rows] != x[cols]) | (y[rows] != y[cols]))
+        for i, j in zip(rows[keep].tolist(), cols[keep].tolist()):
+            shapes.append(("line", (int(centre_x[i]), int(centre_y[i])), (int(centre_x[j]), int(centre_y[j])),
+                           ADJACENCY_COLOUR))
+    if "needs" in overlays and len(x):
+        levels = np.stack(cage.need_levels(), axis=-1)
+        cells, inverse = np.unique(y * cage.width + x, return_inverse=True)
+        mean = np.zeros((len(cells), 3))
+        np.add.at(mean, inverse, levels)
+        mean /= np.bincount(inverse)[:, None]
+        bar = max(2, tile_size // 8)
+        for cell, cell_levels in zip(cells.tolist(), mean):
+            left, bottom = cell % cage.width * tile_size, (cell // cage.width + 1) * tile_size
+            for k, (level, colour) in enumerate(zip(cell_levels, NEED_COLOURS)):
+                length = int(np.clip(level / 100, 0, 1) * tile_size)
+                if length:
+                    shapes.append(("rect", (left, bottom - (k + 1) * bar, length, bar), colour))
+    return shapes
+
+
+class Renderer(Observer):
+    """
+    Base class of the ways to show a run, an observer that draws the cage after every
+    step_interval steps.
+
+    Renderers import their dependencies (pygame, cv2) when the run starts, so a headless
+    run never imports them. Pass one as renderer= of Cage.simulate, see make_renderer.
+    """
+    step_interval = 1
+
+
+class TerminalRenderer(Renderer):
+    """Prints the character grid of the cage, like Cage.display_printed."""
+    def on_step(self, cage, step):
+        started = cage.stats.clock()
+        for row in cell_grid(cage):
+            print(" ".join(row))
+        print("\n")
+        cage.stats.add("display", started)
+
+
+class TileRenderer(Renderer):
+    """
+    Draws the cage as tiles of tile_size pixels onto a pygame surface, optionally
+    writing every frame to a video file (record = path).
+
+    The static floor, walls and resources are rendered once into a background. Every
+    frame only the cells whose number of chickens changed are redrawn (dirty cells), so
+    the cost follows the chickens that moved rather than the size of the cage. Cells
+    with several chickens get a badge with their number. Call redraw() after changing
+    walls or resources during a run. With overlays (see overlay_shapes) every frame
+    is drawn in full.
+    """
+    def __init__(self, fps=3, tile_size=64, record=None, codec="MJPG", queue_size=8, overlays=()):
+        self.fps = fps
+        self.tile_size = tile_size
+        self.record = record
+        self.codec = codec
+        self.queue_size = queue_size
+        self.overlays = tuple(overlays)
+        self.surface = None
+        self.frame_writer = None
+        self.background = None
+        self.counts = None  # chickens per cell in the last frame, None = redraw everything
+        self.badges = {}
+
+    def load_images(self):
+        import pygame
+
+        images = {}
+        for cell, colour in TILE_COLOURS.items():
+            images[cell] = pygame.Surface((self.tile_size, self.tile_size))
+            images[cell].fill(colour)
+        images['C'] = pygame.transform.scale(pygame.image.load(CHICKEN_IMAGE), (self.tile_size, self.tile_size))
+        return images
+
+    def frame_size(self, cage):
+        return cage.width * self.tile_size, cage.height * self.tile_size
+
+    def on_start(self, cage, steps):
+        import pygame
+
+        self.images = self.load_images()
+        pygame.font.init()
+        self.font = pygame.font.Font(None, max(12, self.tile_size // 2))
+        self.badges = {}
+        self.redraw(cage)
+        if self.record:
+            self.frame_writer = FrameWriter(self.record, self.fps, self.frame_size(cage), self.codec,
+                                            queue_size=self.queue_size)
+
+    def redraw(self, cage):
+        """Render the background again and redraw every cell in the next frame."""
+        import pygame
+
+        self.background = pygame.Surface(self.frame_size(cage))
+        for y in range(cage.height):
+            for x in range(cage.width):
+                self.background.blit(self.images['.'], (x * self.tile_size, y * self.tile_size))
+        for x, y, cell in static_cells(cage):
+            self.background.blit(self.images[cell], (x * self.tile_size, y * self.tile_size))
+        self.counts = None
+
+    def badge(self, count):
+        if count not in self.badges:
+            self.badges[count] = self.font.render(str(count), True, (255, 255, 255), (200, 0, 0))
+        return self.badges[count]
+
+    def draw(self, cage):
+        """
+        Draw the dirty cells onto the surface.
+
+        Returns:
+            list: pygame.Rect of every redrawn cell, None if the whole surface was redrawn
+        """
+        import pygame
+
+        counts = chicken_counts(cage)
+        if self.counts is None or self.overlays:
+            self.surface.blit(self.background, (0, 0))
+            ys, xs = np.nonzero(counts)
+            rects = None
+        else:
+            ys, xs = np.nonzero(counts != self.counts)
+            rects = []
+        size = self.tile_size
+        for x, y in zip(xs.tolist(), ys.tolist()):
+            rect = pygame.Rect(x * size, y * size, size, size)
+            self.surface.blit(self.background, rect, area=rect)
+            count = counts[y, x]
+            if count:
+                self.surface.blit(self.images['C'], rect)
+                if count > 1:
+                    self.surface.blit(self.badge(count), rect)
+            if rects is not None:
+                rects.append(rect)
+        self.counts = counts
+        for shape in overlay_shapes(cage, self.overlays, size):
+            if shape[0] == "line":
+                pygame.draw.line(self.surface, shape[3], shape[1], shape[2], max(1, size // 16))
+            else:
+                pygame.draw.rect(self.surface, shape[2], shape[1])
+        return rects
+
+    def write_frame(self, stats):
+        """Queue the surface for the video, converted to BGR in the same copy."""
+        import pygame
+
+        started = stats.clock()
+        index, buffer = self.frame_writer.buffer()
+        pixels = pygame.surfarray.pixels3d(self.surface)  # (width, height, 3) RGB view, locks the surface
+        np.copyto(buffer, pixels.transpose(1, 0, 2)[:, :, ::-1])
+        del pixels
+        self.frame_writer.submit(index)
+        stats.add("frame_capture", started)
+
+    def on_finish(self, cage):
+        if self.frame_writer is not None:
+            started = cage.stats.clock()
+            self.frame_writer.close()
+            cage.stats.add("encode", started)
+            self.frame_writer = None
+
+
+class PygameRenderer(TileRenderer):
+    """Live pygame window at fps frames per second, closing the window ends the program."""
+    def on_start(self, cage, steps):
+        import pygame
+
+        pygame.init()
+        self.surface = pygame.display.set_mode(self.frame_size(cage))
+        self.clock = pygame.time.Clock()
+        super().on_start(cage, steps)
+
+    def on_step(self, cage, step):
+        import pygame
+
+        stats = cage.stats
+        started = stats.clock()
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                exit()
+        rects = self.draw(cage)
+        if rects is None:
+            pygame.display.flip()
+        elif rects:
+            pygame.display.update(rects)
+        stats.add("display", started)
+        started = stats.clock()
+        self.clock.tick(self.fps)  # Control FPS
+        stats.add("frame_wait", started)
+        if self.frame_writer is not None:
+            self.write_frame(stats)
+
+    def on_finish(self, cage):
+        import pygame
+
+        super().on_finish(cage)
+        pygame.quit()
+
+
+class VideoRenderer(Renderer):
+    """
+    Writes the cage to a video file without pygame or a window (works on headless servers).
+
+    Frames are composed in a NumPy BGR buffer from tiles of tile_size pixels, redrawing
+    only the cells whose chickens changed like TileRenderer, and encoded by a
+    FrameWriter thread, so the simulation only pays for the changed cells and one copy
+    per frame. Every every-th step is written; size (width, height) scales the output.
+    overlays are drawn like in TileRenderer.
+    """
+    def __init__(self, path="video.avi", fps=3, tile_size=64, codec="MJPG", every=1, size=None, queue_size=8,
+                 overlays=()):
+        self.path = path
+        self.overlays = tuple(overlays)
+        self.fps = fps
+        self.tile_size = tile_size
+        self.codec = codec
+        self.step_interval = every
+        self.size = size
+        self.queue_size = queue_size
+        self.frame_writer = None
+        self.counts = None
+        self.badges = {}
+
+    def load_tiles(self):
+        import cv2
+
+        size = self.tile_size
+        tiles = {cell: np.full((size, size, 3), colour[::-1], dtype=np.uint8) for cell, colour in TILE_COLOURS.items()}
+        tiles['C'] = cv2.resize(cv2.imread(CHICKEN_IMAGE), (size, size), interpolation=cv2.INTER_AREA)
+        return tiles
+
+    def on_start(self, cage, steps):
+        self.tiles = self.load_tiles()
+        self.badges = {}
+        self.frame = np.zeros((cage.height * self.tile_size, cage.width * self.tile_size, 3), dtype=np.uint8)
+        self.redraw(cage)
+        self.frame_writer = FrameWriter(self.path, self.fps, (self.frame.shape[1], self.frame.shape[0]), self.codec,
+                                        output_size=self.size, queue_size=self.queue_size)
+
+    def cells(self, frame):
+        """frame as (height, tile, width, tile, 3), cells are indexed [y, :, x, :]."""
+        size = self.tile_size
+        return frame.reshape(frame.shape[0] // size, size, frame.shape[1] // size, size, 3)
+
+    def redraw(self, cage):
+        """Compose the background again and redraw every cell in the next frame."""
+        self.background = np.empty_like(self.frame)
+        background = self.cells(self.background)
+        background[:] = self.tiles['.'][None, :, None, :, :]
+        for x, y, cell in static_cells(cage):
+            background[y, :, x, :] = self.tiles[cell]
+        self.counts = None
+
+    def badge(self, count):
+        import cv2
+
+        if count not in self.badges:
+            tile = self.tiles['C'].copy()
+            cv2.putText(tile, str(count), (2, self.tile_size // 3), cv2.FONT_HERSHEY_SIMPLEX,
+                        self.tile_size / 64, (255, 255, 255), max(1, self.tile_size // 32))
+            self.badges[count] = tile
+        return self.badges[count]
+
+    def draw(self, cage):
+        counts = chicken_counts(cage)
+        if self.counts is None or self.overlays:
+            self.frame[:] = self.background
+            changed = counts > 0
+        else:
+            changed = counts != self.counts
+        frame, background = self.cells(self.frame), self.cells(self.background)
+        ys, xs = np.nonzero(changed)
+        changed_counts = counts[ys, xs]
+        empty = changed_counts == 0
+        frame[ys[empty], :, xs[empty], :] = background[ys[empty], :, xs[empty], :]
+        single = changed_counts == 1
+        frame[ys[single], :, xs[single], :] = self.tiles['C']
+        for y, x, count in zip(ys[changed_counts > 1], xs[changed_counts > 1], changed_counts[changed_counts > 1]):
+            frame[y, :, x, :] = self.badge(int(count))
+        self.counts = counts
+        if self.overlays:
+            import cv2
+
+            for shape in overlay_shapes(cage, self.overlays, self.tile_size):
+                if shape[0] == "line":
+                    cv2.line(self.frame, shape[1], shape[2], shape[3][::-1], max(1, self.tile_size // 16))
+                else:
+                    left, top, width, height = shape[1]
+                    self.frame[top:top + height, left:left + width] = shape[2][::-1]
+
+    def on_step(self, cage, step):
+        stats = cage.stats
+        started = stats.clock()
+        self.draw(cage)
+        stats.add("display", started)
+        started = stats.clock()
+        self.frame_writer.write(self.frame)
+        stats.add("frame_capture", started)
+
+    def on_finish(self, cage):
+        started = cage.stats.clock()
+        self.frame_writer.close()
+        cage.stats.add("encode", started)
+        self.frame_writer = None
+
+
+RENDERERS = {"none": None, "terminal": TerminalRenderer, "pygame": PygameRenderer, "video": VideoRenderer}
+
+
+def make_renderer(renderer, **kwargs):
+    """Renderer instance from a name of RENDERERS (created with kwargs), a Renderer or None."""
+    if renderer is None or isinstance(renderer, Renderer):
+        return renderer
+    if renderer not in RENDERERS:
+        raise ValueError(f"Unknown renderer {renderer}")
+    return RENDERERS[renderer](**kwargs) if RENDERERS[renderer] else None
@@ -0,0 +1,105 @@
+import numpy as np
+
+from src.GridObject import GridObject
+from src.Renderer import make_renderer
+from src.SimulationStats import SimulationStats
+from src.Trajectory import TrajectoryReader
+
+
+class ReplayCage:
+    """
+    Read-only stand-in for a cage at one logged step of a trajectory, with what the
+    renderers use: size, walls, resources, chicken positions and need levels.
+    """
+    def __init__(self, header):
+        self.width = header["width"]
+        self.height = header["height"]
+        self.proximity_radius = header["proximity_radius"]
+        self.wall_positions = {tuple(position) for position in header.get("wall_positions", [])}
+        self.resources = [GridObject(x, y) for x, y in header["resource_positions"]]
+        self.resource_kinds = header["resource_kinds"]
+        self.food_sources, self.water_sources, self.bathing_areas = (
+            [r for r, k in zip(self.resources, self.resource_kinds) if k == kind] for kind in ("food", "water", "bath"))
+        self.all_object_names = header["object_names"]
+        self.stats = SimulationStats(enabled=False)
+        self.step = None
+        self.x = self.y = self.needs = None
+
+    def chicken_positions(self):
+        return self.x, self.y
+
+    def need_levels(self):
+        """food, water and clean arrays of the chickens."""
+        if self.needs is None:
+            raise ValueError("The trajectory was logged without needs")
+        return self.needs[:, 0], self.needs[:, 1], self.needs[:, 2]
+
+
+class Replay:
+    """
+    Renders a TrajectoryLog without simulating again.
+
+    Every record holds the absolute state of its step, so any step is found by a binary
+    search over the record steps and read on its own: seeking is as fast at the end of a
+    long run as at the start, and any range can be played at any speed (fps of the
+    renderer, every = records skipped per frame).
+    """
+    def __init__(self, reader):
+        self.reader = reader if isinstance(reader, TrajectoryReader) else TrajectoryReader(reader)
+        self.cage = ReplayCage(self.reader.header)
+
+    def __len__(self):
+        return len(self.reader)
+
+    def seek(self, step):
+        """The cage at the last logged step up to step."""
+        index = int(np.searchsorted(self.reader.steps, step, side="right")) - 1
+        if index < 0:
+            raise ValueError(f"No record at or before step {step}")
+        self.set_record(self.reader.records[index])
+        return self.cage
+
+    def set_record(self, record):
+        self.cage.step = int(record["step"])
+        self.cage.x, self.cage.y = record["x"].astype(int), record["y"].astype(int)
+        self.cage.needs = np.array(record["needs"]) if self.reader.has_needs else None
+
+    def frames(self, first_step=None, last_step=None, every=1, chunk_size=1024):
+        """
+        Yields the cage at every every-th record of the steps first_step to last_step
+        (inclusive), reading chunk_size of the shown records at a time (skipped ones are never read).
+        """
+        start, stop = self.reader.record_range(first_step, last_step)
+        for chunk_start in range(start, stop, chunk_size * every):
+            records = np.array(self.reader.records[chunk_start:min(chunk_start + chunk_size * every, stop):every])
+            for record in records:
+                self.set_record(record)
+                yield self.cage
+
+    def play(self, renderer="pygame", first_step=None, last_step=None, every=1, **renderer_kwargs):
+        """
+        Render the steps first_step to last_step (inclusive).
+
+        Args:
+            renderer: Renderer or name of one (see make_renderer), e.g. "pygame" or "video"
+            first_step, last_step: Window of steps to play (default the whole log)
+            every: Play every every-th record
+            renderer_kwargs: Passed to a renderer created by name, e.g. fps, path or
+                overlays=("adjacency", "needs")
+
+        Returns:
+            int: Number of frames rendered
+        """
+        renderer = make_renderer(renderer, **renderer_kwargs)
+        if renderer is None:
+            raise ValueError("Replay needs a renderer")
+        start, stop = self.reader.record_range(first_step, last_step)
+        n_frames = len(range(start, stop, every))
+        if n_frames == 0:
+            raise ValueError("No records in the window")
+        self.seek(int(self.reader.steps[start]))
+        renderer.on_start(self.cage, n_frames)
+        for cage in self.frames(first_step, last_step, every):
+            renderer.on_step(cage, cage.step)
+        renderer.on_finish(self.cage)
+        return n_frames
@@ -0,0 +1,111 @@
+import time
+from collections import defaultdict
+
+# Phases in the order they are reported
+PHASES = ("burn_in", "move", "interact", "sync", "snapshot", "display", "frame_wait", "frame_capture", "encode")
+
+
+class SimulationStats:
+    """
+    Wall time and call counts per phase of a simulation run.
+
+    Cage.simulate and Cage.simulate_visual always count steps and total wall time
+    (throughput, ETA). Per-phase timing only happens when enabled, the disabled
+    clock()/add() calls return immediately and Cage.update keeps its plain loop.
+    With per_type, the time of every chicken's move and interact is also summed
+    per chicken class (object engine only).
+    """
+    def __init__(self, enabled=True, per_type=False, progress_interval=None):
+        self.enabled = enabled
+        self.per_type = per_type
+        self.progress_interval = progress_interval  # print throughput and ETA every so many steps
+        self.times = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.type_times = defaultdict(float)
+        self.type_counts = defaultdict(int)
+        self.steps = 0
+        self.total_steps = 0
+        self.start_time = None
+        self.wall_time = 0.0
+        self.end_state = {}
+
+    def clock(self):
+        return time.perf_counter() if self.enabled else 0.0
+
+    def add(self, phase, started, count=1):
+        """Add the time since started (a clock() value) to phase."""
+        if self.enabled:
+            self.times[phase] += time.perf_counter() - started
+            self.counts[phase] += count
+
+    def add_time(self, phase, seconds, count=1):
+        self.times[phase] += seconds
+        self.counts[phase] += count
+
+    def add_type(self, name, seconds, count=1):
+        self.type_times[name] += seconds
+        self.type_counts[name] += count
+
+    def start(self, total_steps):
+        self.total_steps = total_steps
+        self.steps = 0
+        self.start_time = time.perf_counter()
+
+    def step_done(self):
+        self.steps += 1
+        self.wall_time = time.perf_counter() - self.start_time
+        if self.progress_interval and self.steps % self.progress_interval == 0:
+            print(f"Step {self.steps}/{self.total_steps} \t{self.throughput():.1f} steps/s \tETA {self.eta():.1f} s")
+
+    def finish(self, chickens):
+        """Stop the clock and keep the mean need levels per chicken class."""
+        if self.start_time is not None:
+            self.wall_time = time.perf_counter() - self.start_time
+        by_type = defaultdict(list)
+        for chicken in chickens:
+            by_type[type(chicken).__name__].append(chicken)
+        self.end_state = {name: {"chickens": len(group),
+                                 "food": sum(c.food for c in group) / len(group),
+                                 "water": sum(c.water for c in group) / len(group),
+                                 "clean": sum(c.clean for c in group) / len(group)}
+                          for name, group in by_type.items()}
+
+    def throughput(self):
+        """Steps per second after burn-in."""
+        return self.steps / self.wall_time if self.wall_time > 0 else 0.0
+
+    def eta(self):
+        """Estimated seconds until total_steps are done."""
+        rate = self.throughput()
+        return (self.total_steps - self.steps) / rate if rate > 0 else float("inf")
+
+    def as_dict(self):
+        return {
+            "steps": self.steps,
+            "wall_time": self.wall_time,
+            "steps_per_second": self.throughput(),
+            "phases": {phase: {"time": self.times[phase], "calls": self.counts[phase]} for phase in self.phases()},
+            "chicken_types": {name: {"time": self.type_times[name], "calls": self.type_counts[name]}
+                              for name in self.type_times},
+            "end_state": self.end_state,
+        }
+
+    def phases(self):
+        return [phase for phase in PHASES if phase in self.times] + \
+            [phase for phase in self.times if phase not in PHASES]
+
+    def report(self):
+        lines = ["Simulation report:",
+                 f"{self.steps} steps in {self.wall_time:.2f} s ({self.throughput():.1f} steps/s)"]
+        if self.enabled:
+            total = sum(self.times.values())
+            for phase in self.phases():
+                share = self.times[phase] / total if total > 0 else 0
+                lines.append(f"  {phase:14s} {self.times[phase]:9.3f} s {share:6.1%} \t{self.counts[phase]} calls")
+            for name in self.type_times:
+                per_call = self.type_times[name] / max(1, self.type_counts[name])
+                lines.append(f"  {name:24s} {self.type_times[name]:9.3f} s \t{per_call * 1e6:.1f} us per chicken step")
+        for name, state in self.end_state.items():
+            lines.append(f"{state['chickens']} {name} \tmean Food: {state['food']:.1f} \tWater: {state['water']:.1f} "
+                         f"\tClean: {state['clean']:.1f}")
+        return "\n".join(lines)
@@ -0,0 +1,115 @@
+import numpy as np
+
+
+class SnapshotStore:
+    """
+    Bit-packed history of symmetric boolean adjacency snapshots.
+
+    Only the upper triangle (without the diagonal) of every snapshot is kept, packed to
+    bits: n (n - 1) / 2 bits per snapshot instead of n^2 bytes for a boolean matrix.
+    Sums over any range of snapshots (averages, weeks) are computed by unpacking blocks
+    of snapshots at a time. It has the add() of AdjacencyAccumulator, so it can be passed
+    as the accumulator of Cage.simulate, and indexing gives back dense matrices, so it
+    also works with read_all_weeks.
+    """
+    def __init__(self, n=None, block_size=256):
+        self.n = None
+        self.block_size = block_size  # snapshots unpacked at once when summing
+        self.count = 0
+        self.packed = None
+        if n is not None:
+            self.allocate(n)
+
+    def allocate(self, n, capacity=64):
+        self.n = n
+        # mask of the stored pairs, 1 byte per cell instead of 16 bytes of indices per pair
+        self.upper = np.triu(np.ones((n, n), dtype=bool), k=1)
+        self.n_bits = n * (n - 1) // 2
+        self.packed = np.zeros((capacity, (self.n_bits + 7) // 8), dtype=np.uint8)
+
+    def add(self, adj_matrix):
+        """Add one snapshot, a dense numpy matrix or a scipy.sparse matrix."""
+        if self.packed is None:
+            self.allocate(adj_matrix.shape[0])
+        if self.count == len(self.packed):
+            self.packed = np.concatenate([self.packed, np.zeros_like(self.packed)])
+        if isinstance(adj_matrix, np.ndarray):
+            bits = adj_matrix[self.upper] != 0
+        else:
+            from scipy import sparse
+
+            upper = sparse.triu(adj_matrix, k=1).tocoo()
+            i, j = upper.row[upper.data != 0].astype(np.int64), upper.col[upper.data != 0].astype(np.int64)
+            bits = np.zeros(self.n_bits, dtype=bool)
+            # position of (i, j) in the row-major upper triangle
+            bits[i * self.n - i * (i + 1) // 2 + j - i - 1] = True
+        self.packed[self.count] = np.packbits(bits)
+        self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    def unpack(self, start, stop):
+        """(stop - start, n_bits) upper triangle bits of a range of snapshots."""
+        return np.unpackbits(self.packed[start:stop], axis=1, count=self.n_bits)
+
+    def to_matrix(self, upper):
+        """Symmetric (n, n) matrix from upper triangle values."""
+        matrix = np.zeros((self.n, self.n), dtype=upper.dtype)
+        matrix[self.upper] = upper
+        return matrix + matrix.T
+
+    def __getitem__(self, index):
+        """Dense boolean snapshot, or a list of them for a slice."""
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("snapshot index out of range")
+        return self.to_matrix(self.unpack(index, index + 1)[0].astype(bool))
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    def counts(self, start=0, stop=None):
+        """(n, n) number of snapshots start to stop in which each pair was adjacent."""
+        stop = self.count if stop is None else min(stop, self.count)
+        total = np.zeros(self.n_bits, dtype=np.int64)
+        for block in range(start, stop, self.block_size):
+            total += self.unpack(block, min(block + self.block_size, stop)).sum(axis=0, dtype=np.int64)
+        return self.to_matrix(total)
+
+    def average(self, start=0, stop=None):
+        """Average adjacency matrix over the snapshots start to stop, like calculate_avg_adj_list."""
+        stop = self.count if stop is None else min(stop, self.count)
+        if stop <= start:
+            raise ValueError("No adjacency snapshots in the range")
+        return self.counts(start, stop) / (stop - start)
+
+    def week_averages(self, week_size=5):
+        """Averages of the complete weeks of week_size snapshots, like read_week_adj_data."""
+        return [self.average(start, start + week_size)
+                for start in range(0, self.count - week_size + 1, week_size)]
+
+    def to_dataframe(self, week_size=5):
+        """DataFrame with one averaged matrix per complete week plus week-all, like read_all_weeks."""
+        import pandas as pd
+
+        weeks = self.week_averages(week_size)
+        return pd.DataFrame({"names": [f'week-{week}' for week in range(1, len(weeks) + 1)] + ['week-all'],
+                             "adj_matr": weeks + [self.average()]})
+
+    def save(self, path):
+        np.savez_compressed(path, n=self.n, packed=self.packed[:self.count])
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            store = cls(int(data["n"]))
+            store.packed = data["packed"].copy()
+        store.count = len(store.packed)
+        if store.count == 0:
+            store.packed = np.zeros((1, store.packed.shape[1]), dtype=np.uint8)
+        return store
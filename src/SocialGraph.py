@@ -0,0 +1,174 @@
+import numpy as np
+
+RELATIONS = ("friends", "enemies")
+
+
+def csr_from_edges(n, rows, cols):
+    """(indptr, indices) of the n x n boolean matrix with the edges (rows[e], cols[e]), duplicates dropped."""
+    keys = np.asarray(rows, dtype=np.int64) * n + np.asarray(cols, dtype=np.int64)
+    if np.any(keys[1:] <= keys[:-1]):
+        keys = np.sort(keys)
+        keys = keys[np.concatenate([[True], keys[1:] != keys[:-1]])]
+    if n == 0:
+        return np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int32)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys // n, minlength=n), out=indptr[1:])
+    return indptr, (keys % n).astype(np.int32)
+
+
+def group_edges(labels):
+    """
+    Edges of group structured relationships: friends with every other member of the own group,
+    enemies with every member of all other groups.
+
+    Returns:
+        dict: relation -> (rows, cols)
+    """
+    edges = {"friends": ([], []), "enemies": ([], [])}
+    for group in np.unique(labels):
+        members = np.flatnonzero(labels == group)
+        others = np.flatnonzero(labels != group)
+        rows, cols = np.repeat(members, len(members)), np.tile(members, len(members))
+        edges["friends"][0].append(rows[rows != cols])
+        edges["friends"][1].append(cols[rows != cols])
+        edges["enemies"][0].append(np.repeat(members, len(others)))
+        edges["enemies"][1].append(np.tile(others, len(members)))
+    empty = np.empty(0, dtype=int)
+    return {kind: (np.concatenate(rows + [empty]), np.concatenate(cols + [empty]))
+            for kind, (rows, cols) in edges.items()}
+
+
+def csr_rows(indptr):
+    """Row of every stored edge."""
+    return np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+
+
+class SocialGraph:
+    """
+    Friend and enemy relations of a flock, stored as sparse boolean matrices in CSR layout.
+
+    Row i of a relation lists the chickens that chickens[i] considers friends (enemies).
+    The two relations are kept apart because a chicken can consider another one both a
+    friend and an enemy. Bulk edges come from index arrays (set_edges), single edges
+    added with add() are buffered and merged on the next read, so building a graph
+    edge by edge does not rebuild the arrays every time. Group structured relations
+    (set_groups) are only kept as labels until the edges are read, they have O(N^2) of them.
+    """
+    def __init__(self, chickens):
+        self.chickens = list(chickens)
+        self.n = len(self.chickens)
+        self.indptr = {kind: np.zeros(self.n + 1, dtype=np.int64) for kind in RELATIONS}
+        self.indices = {kind: np.empty(0, dtype=np.int32) for kind in RELATIONS}
+        self.pending = {kind: set() for kind in RELATIONS}
+        self.groups = None  # group label per row while the edges of set_groups are not built
+        for row, chicken in enumerate(self.chickens):
+            chicken.social = self
+            chicken.row = row
+
+    def join(self, chickens):
+        """Add chickens without relations as new rows."""
+        chickens = [c for c in chickens if c.social is not self]
+        for kind in RELATIONS:
+            self.flush(kind)
+            indptr = self.indptr[kind]
+            self.indptr[kind] = np.concatenate([indptr, np.full(len(chickens), indptr[-1], dtype=np.int64)])
+        for chicken in chickens:
+            chicken.social = self
+            chicken.row = self.n
+            self.chickens.append(chicken)
+            self.n += 1
+
+    def merge(self, other):
+        """Move the chickens and relations of another graph into this one, its rows come last."""
+        offset = self.n
+        other_edges = {kind: other.edges(kind) for kind in RELATIONS}
+        self.join(other.chickens)
+        for kind, (rows, cols) in other_edges.items():
+            self.add_edges(kind, rows + offset, cols + offset)
+
+    def set_row(self, kind, row, cols):
+        """Replace the relations of one chicken."""
+        rows, old_cols = self.edges(kind)
+        keep = rows != row
+        self.set_edges(kind, np.concatenate([rows[keep], np.full(len(cols), row)]),
+                       np.concatenate([old_cols[keep], np.asarray(cols, dtype=np.int64)]))
+
+    def set_groups(self, labels):
+        """Replace all edges by group structured relations of the group labels, see group_edges."""
+        for kind in RELATIONS:
+            self.pending[kind].clear()
+        self.groups = np.unique(labels, return_inverse=True)[1].ravel()
+
+    def build_groups(self):
+        """Build the edges of set_groups."""
+        if self.groups is None:
+            return
+        labels, self.groups = self.groups, None
+        for kind, (rows, cols) in group_edges(labels).items():
+            self.indptr[kind], self.indices[kind] = csr_from_edges(self.n, rows, cols)
+
+    def set_edges(self, kind, rows, cols):
+        """Replace all edges of a relation by (rows[e], cols[e])."""
+        self.build_groups()
+        self.indptr[kind], self.indices[kind] = csr_from_edges(self.n, rows, cols)
+        self.pending[kind].clear()
+
+    def add_edges(self, kind, rows, cols):
+        old_rows, old_cols = self.edges(kind)
+        self.set_edges(kind, np.concatenate([old_rows, rows]), np.concatenate([old_cols, cols]))
+
+    def flush(self, kind):
+        self.build_groups()
+        if self.pending[kind]:
+            rows, cols = np.array(list(self.pending[kind])).T
+            self.pending[kind].clear()
+            self.add_edges(kind, rows, cols)
+
+    def csr(self, kind):
+        """(indptr, indices) of a relation, columns sorted within every row."""
+        self.flush(kind)
+        return self.indptr[kind], self.indices[kind]
+
+    def edges(self, kind):
+        """(rows, cols) of all edges of a relation, sorted by row then column."""
+        indptr, indices = self.csr(kind)
+        return csr_rows(indptr), indices
+
+    def neighbours(self, kind, row):
+        indptr, indices = self.csr(kind)
+        return indices[indptr[row]:indptr[row + 1]]
+
+    def degrees(self, kind):
+        return np.diff(self.csr(kind)[0])
+
+    def add(self, kind, row, col):
+        self.build_groups()
+        self.pending[kind].add((row, col))
+
+    def remove(self, kind, row, col):
+        indptr, indices = self.csr(kind)
+        row_indices = indices[indptr[row]:indptr[row + 1]]
+        position = np.searchsorted(row_indices, col)
+        if position < len(row_indices) and row_indices[position] == col:
+            self.indices[kind] = np.delete(indices, indptr[row] + position)
+            indptr[row + 1:] -= 1
+
+    def to_scipy(self, kind):
+        """The relation as a scipy.sparse CSR matrix."""
+        from scipy import sparse  # only needed for analysis outside the simulation
+
+        indptr, indices = self.csr(kind)
+        return sparse.csr_matrix((np.ones(len(indices), dtype=bool), indices, indptr), shape=(self.n, self.n))
+
+    def statistics(self):
+        """Mean and extreme numbers of friends and enemies per chicken."""
+        friend_counts = self.degrees("friends")
+        enemy_counts = self.degrees("enemies")
+        return {
+            "mean_friends": friend_counts.mean(),
+            "mean_enemies": enemy_counts.mean(),
+            "max_friends": friend_counts.max(),
+            "max_enemies": enemy_counts.max(),
+            "min_friends": friend_counts.min(),
+            "min_enemies": enemy_counts.min(),
+        }
@@ -0,0 +1,236 @@
+import json
+import os
+
+import numpy as np
+
+from src.Observer import Observer
+from src.AdjacencyAccumulator import AdjacencyAccumulator
+from src.adjacency import dense_adjacency_stack
+
+MAGIC = b"CHICKTRJ"
+VERSION = 1
+ALIGNMENT = 64
+
+
+def record_dtype(n_chicken, needs=False):
+    """One record per logged step: the step number, x and y of every chicken, optionally the need levels."""
+    fields = [("step", np.int64), ("x", np.int16, (n_chicken,)), ("y", np.int16, (n_chicken,))]
+    if needs:
+        fields.append(("needs", np.float32, (n_chicken, 3)))  # food, water, clean
+    return np.dtype(fields)
+
+
+def read_header(f):
+    """(header, offset of the first record) of an open trajectory file."""
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a trajectory file")
+    length = int(np.frombuffer(f.read(4), dtype="<u4")[0])
+    header = json.loads(f.read(length).decode())
+    if header["version"] != VERSION:
+        raise ValueError(f"Unsupported trajectory version {header['version']}")
+    return header, len(MAGIC) + 4 + length
+
+
+class TrajectoryLog(Observer):
+    """
+    Writes the chicken positions (and with needs=True the need levels) every interval
+    steps to a binary file, read back with TrajectoryReader.
+
+    The file is a JSON header (cage size, resources, object names) followed by fixed
+    size records, so it can be memory-mapped and every step is found by its offset.
+    Records are collected in chunks of chunk_size and appended in one write, a run that
+    crashes loses at most the last chunk. With append=True an existing log of the same
+    flock is continued, e.g. after restoring a checkpoint; records it holds from the
+    first newly logged step on are replaced.
+    """
+    def __init__(self, path, interval=1, needs=False, chunk_size=1024, append=False):
+        self.path = path
+        self.step_interval = interval
+        self.needs = needs
+        self.chunk_size = chunk_size
+        self.append = append
+        self.file = None
+        self.chunk = None
+        self.filled = 0
+        self.offset = 0
+        self.resumed = False
+
+    def on_start(self, cage, steps):
+        n_chicken = len(cage.chickens)
+        dtype = record_dtype(n_chicken, self.needs)
+        self.chunk = np.zeros(self.chunk_size, dtype=dtype)
+        self.filled = 0
+        if self.append and os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                header, offset = read_header(f)
+            if header["n_chicken"] != n_chicken or header["needs"] != self.needs:
+                raise ValueError("The trajectory file was written for another flock")
+            self.file = open(self.path, "r+b")
+            self.offset = offset
+            self.resumed = True
+            return
+        header = {
+            "version": VERSION,
+            "n_chicken": n_chicken,
+            "needs": self.needs,
+            "interval": self.step_interval,
+            "width": cage.width,
+            "height": cage.height,
+            "proximity_radius": cage.proximity_radius,
+            "wall_positions": sorted(cage.wall_positions),
+            "resource_kinds": cage.resource_kinds,
+            "resource_positions": [(r.x, r.y) for r in cage.resources],
+            "object_names": cage.all_object_names,
+        }
+        # padded with spaces so the records start aligned
+        encoded = json.dumps(header).encode()
+        offset = -(-(len(MAGIC) + 4 + len(encoded)) // ALIGNMENT) * ALIGNMENT
+        encoded = encoded.ljust(offset - len(MAGIC) - 4)
+        self.file = open(self.path, "wb")
+        self.file.write(MAGIC + np.array([len(encoded)], dtype="<u4").tobytes() + encoded)
+
+    def truncate(self, step):
+        """Drop the records of step and later ones (and a partly written record) from a continued log."""
+        itemsize = self.chunk.dtype.itemsize
+        records = (os.path.getsize(self.path) - self.offset) // itemsize
+        steps = np.memmap(self.path, dtype=self.chunk.dtype, mode="r", offset=self.offset,
+                          shape=(records,))["step"] if records else np.zeros(0, dtype=np.int64)
+        keep = int(np.searchsorted(steps, step, side="left"))
+        del steps
+        self.file.truncate(self.offset + keep * itemsize)
+        self.file.seek(0, os.SEEK_END)
+
+    def on_step(self, cage, step):
+        if self.resumed:
+            self.truncate(step)
+            self.resumed = False
+        record = self.chunk[self.filled]
+        record["step"] = step
+        record["x"], record["y"] = cage.chicken_positions()
+        if self.needs:
+            record["needs"] = np.stack(cage.need_levels(), axis=-1)
+        self.filled += 1
+        if self.filled == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.chunk[:self.filled].tobytes())
+        self.file.flush()
+        self.filled = 0
+
+    def on_finish(self, cage):
+        self.flush()
+        self.file.close()
+        self.file = None
+
+
+class TrajectoryReader:
+    """
+    Memory-mapped view of a TrajectoryLog file.
+
+    Nothing is loaded up front: slicing reads only the records of the requested steps,
+    and chunks() streams a log of any length with bounded memory.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.header, offset = read_header(f)
+        self.n_chicken = self.header["n_chicken"]
+        self.has_needs = self.header["needs"]
+        self.dtype = record_dtype(self.n_chicken, self.has_needs)
+        n_records = (os.path.getsize(path) - offset) // self.dtype.itemsize
+        self.records = np.memmap(path, dtype=self.dtype, mode="r", offset=offset, shape=(n_records,)) \
+            if n_records else np.zeros(0, dtype=self.dtype)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def steps(self):
+        """Step number of every record."""
+        return self.records["step"]
+
+    def record_range(self, first_step=None, last_step=None):
+        """(start, stop) record indices of the steps first_step to last_step (inclusive)."""
+        steps = self.steps
+        start = 0 if first_step is None else int(np.searchsorted(steps, first_step, side="left"))
+        stop = len(steps) if last_step is None else int(np.searchsorted(steps, last_step, side="right"))
+        return start, stop
+
+    def positions(self, start=None, stop=None, chickens=None):
+        """x and y arrays of shape (records, chickens) for the records start to stop."""
+        records = self.records[start:stop]
+        chickens = slice(None) if chickens is None else chickens
+        return np.array(records["x"][:, chickens]), np.array(records["y"][:, chickens])
+
+    def needs(self, start=None, stop=None, chickens=None):
+        """(records, chickens, 3) food, water and clean levels."""
+        if not self.has_needs:
+            raise ValueError("The trajectory was logged without needs")
+        chickens = slice(None) if chickens is None else chickens
+        return np.array(self.records[start:stop]["needs"][:, chickens])
+
+    def chunks(self, chunk_size=4096, start=None, stop=None, chickens=None):
+        """Yields (steps, x, y) of at most chunk_size records at a time."""
+        start, stop, _ = slice(start, stop).indices(len(self))
+        for chunk_start in range(start, stop, chunk_size):
+            chunk_stop = min(chunk_start + chunk_size, stop)
+            x, y = self.positions(chunk_start, chunk_stop, chickens)
+            yield np.array(self.steps[chunk_start:chunk_stop]), x, y
+
+
+def trajectory_adjacency(reader, interval=5, radius=None, chickens=None, first_step=None, last_step=None,
+                         resources=True, week_size=5, accumulator=None, chunk_size=4096, max_bytes=2 ** 27):
+    """
+    Recompute the adjacency snapshots of a run from its trajectory log, without simulating again.
+
+    A snapshot is taken at every logged step divisible by interval, like adj_matrix_interval
+    of Cage.simulate, and matches Cage.get_adj_matr of that step (chickens first, then the
+    resources at their logged positions). The log is streamed in chunks of chunk_size
+    records and the snapshots are summed into an AdjacencyAccumulator, so memory does
+    not grow with the length of the run.
+
+    Args:
+        reader: TrajectoryReader (or path) of a TrajectoryLog
+        interval: Steps between snapshots, a multiple of the log's interval
+        radius: Chebyshev distance that counts as adjacent (default the cage's proximity_radius)
+        chickens: Indices of the chickens to keep (default all)
+        first_step, last_step: Only use the steps in this window (inclusive)
+        resources: If False, only the chickens are in the matrices
+        accumulator: AdjacencyAccumulator to add to (default a new one with week_size)
+
+    Returns:
+        tuple: (accumulator, names) - average() and to_dataframe() give the same matrices as
+        calculate_avg_adj_list and read_all_weeks of the recomputed snapshots, names are the
+        object names of the rows
+    """
+    if not isinstance(reader, TrajectoryReader):
+        reader = TrajectoryReader(reader)
+    header = reader.header
+    if interval % header["interval"] != 0:
+        raise ValueError(f"interval must be a multiple of the log interval {header['interval']}")
+    radius = header["proximity_radius"] if radius is None else radius
+    accumulator = accumulator if accumulator is not None else AdjacencyAccumulator(week_size=week_size)
+
+    chicken_rows = np.arange(reader.n_chicken) if chickens is None else np.asarray(chickens)
+    names = [header["object_names"][i] for i in chicken_rows]
+    resource_x = np.empty(0, dtype=np.int16)
+    resource_y = np.empty(0, dtype=np.int16)
+    if resources:
+        resource_x, resource_y = np.array(header["resource_positions"], dtype=np.int16).reshape(-1, 2).T
+        names += header["object_names"][reader.n_chicken:]
+
+    start, stop = reader.record_range(first_step, last_step)
+    for steps, x, y in reader.chunks(chunk_size, start, stop, chicken_rows):
+        sampled = steps % interval == 0
+        x = np.concatenate([x[sampled], np.broadcast_to(resource_x, (sampled.sum(), len(resource_x)))], axis=1)
+        y = np.concatenate([y[sampled], np.broadcast_to(resource_y, (sampled.sum(), len(resource_y)))], axis=1)
+        # split at week boundaries so every week gets its own average
+        position = 0
+        while position < len(x):
+            take = min(len(x) - position, accumulator.week_remaining())
+            counts = dense_adjacency_stack(x[position:position + take], y[position:position + take], radius,
+                                           max_bytes)
+            accumulator.add_counts(counts, take)
+            position += take
+    return accumulator, names
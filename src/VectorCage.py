@@ -0,0 +1,601 @@
+from src.Cage import Cage
+from src.Chicken import FollowerChicken
+from src.Food import Food
+from src.Water import Water
+from src.Bath import Bath
+from src.VisitMemory import make_visit_memory
+from src.RandomStream import FlockRandom
+from src.SocialGraph import RELATIONS, csr_from_edges, csr_rows
+from src.adjacency import adjacency_matrix
+import numpy as np
+
+# Same order as in FollowerChicken.move, the last one is standing still
+POSSIBLE_MOVES = np.array([(0, 1), (0, -1), (1, 0), (-1, 0), (0, 0)])
+
+FOOD, WATER, BATH = 0, 1, 2
+
+
+def flock_state(chickens):
+    """Arrays describing one flock of FollowerChickens, keyed by VectorCage attribute name."""
+    for chicken in chickens:
+        if not isinstance(chicken, FollowerChicken):
+            raise ValueError("VectorCage only supports FollowerChicken flocks")
+    state = {
+        "x": np.array([c.x for c in chickens], dtype=int),
+        "y": np.array([c.y for c in chickens], dtype=int),
+        "food": np.array([c.food for c in chickens], dtype=float),
+        "water": np.array([c.water for c in chickens], dtype=float),
+        "clean": np.array([c.clean for c in chickens], dtype=float),
+        "friend_attraction": np.array([c.friend_attraction for c in chickens], dtype=float),
+        "enemy_repulsion": np.array([c.enemy_repulsion for c in chickens], dtype=float),
+        "social_distance_factor": np.array([c.social_distance_factor for c in chickens], dtype=float),
+    }
+
+    return state
+
+
+def flock_graph(chickens):
+    """The SocialGraph of a flock if the flock is exactly its chickens, else None."""
+    graph = chickens[0].social if chickens else None
+    if graph is not None and len(graph.chickens) == len(chickens) and \
+            all(a is b for a, b in zip(graph.chickens, chickens)):
+        return graph
+    return None
+
+
+def flock_relations(chickens):
+    """
+    Friends and enemies of a flock as (indptr, indices) CSR arrays, rows and columns in flock order.
+
+    Read straight from the SocialGraph when the flock is exactly the chickens of one graph.
+    """
+    graph = flock_graph(chickens)
+    if graph is not None:
+        return {kind: graph.csr(kind) for kind in RELATIONS}
+    index = {id(c): i for i, c in enumerate(chickens)}
+    relations = {}
+    for kind in RELATIONS:
+        rows, cols = [], []
+        for i, chicken in enumerate(chickens):
+            for other in chicken.related(kind):
+                rows.append(i)
+                cols.append(index[id(other)])
+        relations[kind] = csr_from_edges(len(chickens), rows, cols)
+    return relations
+
+
+def group_labels(relations):
+    """
+    Group label of every chicken if the relationships are group structured, else None.
+
+    Group structured means friends are exactly the other members of the own group and
+    enemies exactly the members of all other groups (assign_social_relationships_even_vs_odd).
+    relations holds the CSR arrays of one flock, see flock_relations.
+    """
+    friend_indptr, friend_cols = relations["friends"]
+    enemy_indptr, enemy_cols = relations["enemies"]
+    n = len(friend_indptr) - 1
+    friend_rows, enemy_rows = csr_rows(friend_indptr), csr_rows(enemy_indptr)
+    # candidate label: the smallest index among a chicken and its friends
+    first = np.arange(n)
+    has_friends = np.diff(friend_indptr) > 0
+    if has_friends.any():
+        # columns are sorted within every row, the first one is the smallest
+        first[has_friends] = np.minimum(first[has_friends], friend_cols[friend_indptr[:-1][has_friends]])
+    _, labels, sizes = np.unique(first, return_inverse=True, return_counts=True)
+    labels = labels.ravel()
+    size = sizes[labels]
+    if not (np.array_equal(np.diff(friend_indptr), size - 1) and np.array_equal(np.diff(enemy_indptr), n - size)):
+        return None
+    if np.any(friend_rows == friend_cols) or np.any(labels[friend_rows] != labels[friend_cols]) or \
+            np.any(labels[enemy_rows] == labels[enemy_cols]):
+        return None
+    return labels
+
+
+def flock_groups(chickens):
+    """group_labels of a flock, read from the SocialGraph without building its edges if it has groups."""
+    graph = flock_graph(chickens)
+    if graph is not None and graph.groups is not None:
+        return graph.groups
+    return group_labels(flock_relations(chickens))
+
+
+def convolve_grid(density, kernel):
+    """
+    Sum over all cells a of density[..., a] * kernel[c - a] for every cell c, via FFT.
+
+    density has shape (..., H, W), kernel (2H-1, 2W-1) with offset (0, 0) in the middle.
+    """
+    height, width = density.shape[-2:]
+    shape = (3 * height - 2, 3 * width - 2)
+    full = np.fft.irfft2(np.fft.rfft2(density, shape) * np.fft.rfft2(kernel, shape), shape)
+    return full[..., height - 1:2 * height - 1, width - 1:2 * width - 1]
+
+
+class VectorCage(Cage):
+    """
+    Cage that advances a flock of FollowerChickens with batched numpy operations.
+
+    Positions, need levels, social parameters and relationships are kept in arrays
+    (struct-of-arrays) and all candidate moves of all chickens are scored in one pass,
+    using the same scoring rules as FollowerChicken.move. The only behavioural
+    difference is that every chicken scores its moves against the positions at the
+    start of the step, while Cage.update moves the chickens one after another.
+
+    The chicken and resource objects are only synced when they are read: reading
+    chickens, checkpoints and the end of simulate write the arrays back (or call
+    sync_objects). Snapshots, renderers and the built-in observers read the arrays
+    through positions, chicken_positions and need_levels, so a run without them does
+    no per-chicken Python work per step. Observers reading resource amounts mid-run
+    should call sync_objects first.
+
+    All state arrays have the shape batch_shape + (N,) (BatchedCage adds a leading
+    replicate axis), the kernels below work on any batch_shape.
+
+    With social_fields=True the flock must be group structured (see group_labels). The
+    friend and enemy terms are then read from per-group potential maps built once per
+    step, so a step costs O(N + groups * H*W log(H*W)) instead of O(N^2).
+    """
+    batch_shape = ()
+
+    def __init__(self, width, height, chickens, food_positions, water_positions, bath_positions,
+                 visit_memory="dense", proximity_radius=1, wall_positions=None, chunk_size=256,
+                 social_fields=False, seed=None):
+        self.objects_stale = False  # the arrays are ahead of the chicken and resource objects
+        super().__init__(width, height, chickens, food_positions, water_positions, bath_positions,
+                         visit_memory=visit_memory, proximity_radius=proximity_radius,
+                         wall_positions=wall_positions, seed=seed)
+        self.chunk_size = chunk_size  # chickens scored per batch, bounds memory to chunk_size*5*N
+        self.social_fields = social_fields
+        self.flock_random_state = None  # restored by load_checkpoint, applied on the next load
+
+    @Cage.chickens.getter
+    def chickens(self):
+        if self.objects_stale:
+            self.sync_objects()
+        return self._chickens
+
+    @chickens.setter
+    def chickens(self, chickens):
+        self.sync_objects()
+        Cage.chickens.fset(self, chickens)
+
+    def build_index(self):
+        self.sync_objects()
+        self.x = None  # chickens or resources changed, reload the arrays
+        super().build_index()
+
+    def replicates(self):
+        """Cages whose chickens and resources are backed by the arrays."""
+        return [self]
+
+    def load_chickens(self):
+        """Copy the state of the chicken and resource objects into arrays."""
+        cages = self.replicates()
+        states = [flock_state(cage.chickens) for cage in cages]
+        for key in states[0]:
+            value = np.stack([state[key] for state in states])
+            setattr(self, key, value.reshape(self.batch_shape + value.shape[1:]))
+
+        # Resource layout is shared, amounts left are per replicate
+        self.resource_codes = np.array([{"food": FOOD, "water": WATER, "bath": BATH}[kind]
+                                        for kind in self.resource_kinds], dtype=int)
+        self.resource_units = np.array([Food.consume_amount if kind == "food" else
+                                        Water.consume_amount if kind == "water" else 0
+                                        for kind in self.resource_kinds], dtype=int)
+        self.amounts = np.array([[r.current_amount for r in cage.resources] for cage in cages], dtype=int)
+        self.amounts = self.amounts.reshape(self.batch_shape + (len(self.resources),))
+
+        # One visit memory for all chickens, continuing each chicken's own memory
+        self.visits = make_visit_memory(self.x.size, self.height, self.width, backend=self.visit_memory)
+        self.visits.start(self.x.ravel(), self.y.ravel())
+        row = 0
+        for cage in cages:
+            for chicken in cage.chickens:
+                if chicken.visits is not None:
+                    self.visits.copy_row(row, chicken.visits)
+                row += 1
+
+        # Seeded chickens keep drawing from their own streams, a block of steps at a time
+        streams = [chicken.rng for cage in cages for chicken in cage.chickens]
+        self.flock_random = FlockRandom(streams) if streams and None not in streams else None
+        state, self.flock_random_state = self.flock_random_state, None
+        if self.flock_random is not None and state is not None and len(state["anchors"]) == len(streams):
+            self.flock_random.set_state(state)
+
+        if self.social_fields:
+            # the per-group maps replace the pairwise relations, whose edges are not needed
+            self.load_groups([flock_groups(cage.chickens) for cage in cages])
+        else:
+            self.load_relations(cages)
+
+    def load_relations(self, cages):
+        """Relationships of all replicates as one CSR matrix over the flattened chickens."""
+        n = self.x.shape[-1]
+        relations = [flock_relations(cage.chickens) for cage in cages]
+        self.relations = {}
+        for kind in RELATIONS:
+            indptr, indices, offset = [np.zeros(1, dtype=np.int64)], [np.empty(0, dtype=np.int32)], 0
+            for k, flock in enumerate(relations):
+                flock_indptr, flock_indices = flock[kind]
+                indptr.append(flock_indptr[1:] + offset)
+                indices.append((flock_indices + k * n).astype(np.int32))
+                offset += flock_indptr[-1]
+            self.relations[kind] = np.concatenate(indptr), np.concatenate(indices)
+
+    def load_groups(self, labels):
+        """Group labels (one array per replicate, see flock_groups) and kernels of social_fields."""
+        n = self.x.shape[-1]
+        if any(label is None for label in labels):
+            raise ValueError("social_fields needs group structured relationships (friends = own group, "
+                             "enemies = all other groups)")
+        self.groups = np.stack(labels).reshape(self.x.shape)
+        self.n_groups = int(self.groups.max()) + 1 if n else 0
+
+        # kernels indexed by offset (dy, dx) + (H-1, W-1)
+        dy, dx = np.indices((2 * self.height - 1, 2 * self.width - 1))
+        distance = np.abs(dy - (self.height - 1)) + np.abs(dx - (self.width - 1))
+        self.friend_kernel = 1 / np.maximum(1, distance)
+        self.enemy_kernel = np.where(distance <= 2, self.friend_kernel, 0)
+        # |a - b| for all pairs of coordinates, to sum distances per axis
+        self.x_distance = np.abs(np.arange(self.width)[:, None] - np.arange(self.width))
+        self.y_distance = np.abs(np.arange(self.height)[:, None] - np.arange(self.height))
+
+    def sync_objects(self):
+        """sync_chickens if a step ran since the last sync."""
+        if self.objects_stale:
+            started = self.stats.clock()
+            self.sync_chickens()
+            self.stats.add("sync", started)
+
+    def sync_chickens(self):
+        """Write the array state back into the chicken and resource objects."""
+        self.objects_stale = False
+        n = self.x.shape[-1]
+        columns = [a.reshape(-1, n) for a in (self.x, self.y, self.food, self.water, self.clean)]
+        amounts = self.amounts.reshape(-1, len(self.resources))
+        for k, cage in enumerate(self.replicates()):
+            for i, chicken in enumerate(cage.chickens):
+                chicken.x = int(columns[0][k, i])
+                chicken.y = int(columns[1][k, i])
+                chicken.food = float(columns[2][k, i])
+                chicken.water = float(columns[3][k, i])
+                chicken.clean = float(columns[4][k, i])
+            for r, resource in enumerate(cage.resources):
+                resource.current_amount = int(amounts[k, r])
+            cage.build_occupancy()
+
+    def sync_visits(self):
+        """Write the visit memory back into the chicken objects (only needed for checkpoints)."""
+        row = 0
+        for cage in self.replicates():
+            for chicken in cage.chickens:
+                chicken.visits = self.visits.extract_row(row)
+                row += 1
+
+    def needs_load(self):
+        return self.x is None or len(self.x) != len(self._chickens)
+
+    def update(self):
+        # arrays are built lazily, chickens are often added after the cage
+        if self.needs_load():
+            self.load_chickens()
+        if self.x.size == 0:
+            return
+        self.timed_step()
+        self.objects_stale = True
+
+    def finish_run(self, events, stats, report):
+        self.sync_objects()
+        super().finish_run(events, stats, report)
+
+    def step(self):
+        """Advance the array state by one step."""
+        self.move_all()
+        self.interact_all()
+
+    def timed_step(self):
+        """step() with the move and interact phases timed when profiling."""
+        stats = self.stats
+        started = stats.clock()
+        self.move_all()
+        stats.add("move", started, self.x.size)
+        started = stats.clock()
+        self.interact_all()
+        stats.add("interact", started, self.x.size)
+
+    def move_all(self):
+        """Score, choose and make the moves of all chickens, then use up energy."""
+        scores = self.score_moves()
+        chosen = self.choose_moves(scores)
+
+        new_x = self.x + POSSIBLE_MOVES[chosen, 0]
+        new_y = self.y + POSSIBLE_MOVES[chosen, 1]
+        valid = self.valid_positions(new_x, new_y)
+        self.x = np.where(valid, new_x, self.x)
+        self.y = np.where(valid, new_y, self.y)
+
+        self.visits.visit(self.x.ravel(), self.y.ravel())
+
+        # consume_energy
+        self.food -= .8
+        self.water -= 1
+        self.clean -= .1
+
+    def get_adj_matr(self, radius=None, fmt="dense"):
+        if self.needs_load():
+            self.load_chickens()
+        x, y = self.positions()
+        return adjacency_matrix(x, y, self.proximity_radius if radius is None else radius, fmt)
+
+    def chicken_positions(self):
+        if self.x is None:
+            return super().chicken_positions()
+        return self.x.copy(), self.y.copy()
+
+    def need_levels(self):
+        if self.x is None:
+            return super().need_levels()
+        return self.food.copy(), self.water.copy(), self.clean.copy()
+
+    def positions(self):
+        if self.x is None:
+            return super().positions()
+        resource_x = np.broadcast_to([r.x for r in self.resources], self.batch_shape + (len(self.resources),))
+        resource_y = np.broadcast_to([r.y for r in self.resources], self.batch_shape + (len(self.resources),))
+        return np.concatenate([self.x, resource_x], axis=-1).astype(int), \
+            np.concatenate([self.y, resource_y], axis=-1).astype(int)
+
+    def valid_positions(self, x, y):
+        inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        return inside & ~self.walls[np.clip(y, 0, self.height - 1), np.clip(x, 0, self.width - 1)]
+
+    def interact_all(self):
+        """Let every chicken standing on a resource consume it, like Cage.interact in chicken order."""
+        n = self.x.shape[-1]
+        resource_idx = self.resource_grid[self.y, self.x].reshape(-1, n)
+        k, i = np.nonzero(resource_idx != -1)  # sorted by replicate, then chicken
+        if len(k) == 0:
+            return
+        r = resource_idx[k, i]
+
+        # rank of each chicken among the chickens on the same resource in the same replicate
+        key = k * len(self.resources) + r
+        order = np.argsort(key, kind="stable")
+        sorted_key = key[order]
+        rank = np.empty(len(key), dtype=int)
+        rank[order] = np.arange(len(key)) - np.searchsorted(sorted_key, sorted_key, side="left")
+
+        # Consumable.consume: each visit takes min(amount left, unit)
+        unit = self.resource_units[r]
+        amount_idx = np.unravel_index(key, self.amounts.shape)
+        value = np.clip(self.amounts[amount_idx] - rank * unit, 0, unit)
+        np.add.at(self.amounts, amount_idx, -value)
+        is_bath = self.resource_codes[r] == BATH
+        if self.flock_random is not None:
+            streams = self.flock_random.streams
+            value[is_bath] = [streams[row].randint(*Bath.clean_range) for row in k[is_bath] * n + i[is_bath]]
+        else:
+            value[is_bath] = np.random.randint(Bath.clean_range[0], Bath.clean_range[1] + 1, is_bath.sum())
+
+        for code, need in ((FOOD, self.food), (WATER, self.water), (BATH, self.clean)):
+            hit = self.resource_codes[r] == code
+            need[np.unravel_index(k[hit] * n + i[hit], need.shape)] += value[hit]
+
+    def score_moves(self):
+        """Return the batch_shape + (N, 5) array of move scores, 0 for moves leaving the cage."""
+        new_x = self.x[..., None] + POSSIBLE_MOVES[:, 0]
+        new_y = self.y[..., None] + POSSIBLE_MOVES[:, 1]
+        valid = self.valid_positions(new_x, new_y)
+        # clipped copies for lookups, scores of moves leaving the cage are zeroed anyway
+        cell_x = np.clip(new_x, 0, self.width - 1)
+        cell_y = np.clip(new_y, 0, self.height - 1)
+
+        scores = np.full(new_x.shape, FollowerChicken.base_random_weight)
+
+        # Resource attraction
+        hunger_need = np.maximum(0, (100 - self.food) / 100)**2
+        thirst_need = np.maximum(0, (100 - self.water) / 100)**2
+        cleanliness_need = np.maximum(0, (100 - self.clean) / 100)**2
+        for kind, need, weight in (("food", hunger_need, FollowerChicken.hunger_weight),
+                                   ("water", thirst_need, FollowerChicken.thirst_weight),
+                                   ("bath", cleanliness_need, FollowerChicken.cleanliness_weight)):
+            field = self.distance_fields[kind]
+            current_dist = field[self.y, self.x][..., None]
+            new_dist = field[cell_y, cell_x]
+            closer = new_dist < current_dist
+            # bonus for closing in plus the distance based attraction (inf where unreachable)
+            with np.errstate(invalid="ignore"):
+                bonus = (need * weight)[..., None] * (1 + (current_dist - new_dist) / np.maximum(1, current_dist))
+            scores += np.where(closer, bonus, 0)
+
+        # Social attraction and repulsion, in chunks of chickens to bound memory
+        if self.social_fields:
+            scores += self.social_field_scores(cell_x, cell_y)
+        else:
+            flat_scores = scores.reshape(-1, scores.shape[-1])
+            flat_x, flat_y = new_x.reshape(flat_scores.shape), new_y.reshape(flat_scores.shape)
+            for start in range(0, self.x.size, self.chunk_size):
+                stop = min(start + self.chunk_size, self.x.size)
+                flat_scores[start:stop] += self.social_scores(start, stop, flat_x, flat_y)
+
+        # Recency penalty
+        rows = np.arange(self.x.size).reshape(self.x.shape + (1,))
+        scores -= self.visits.recency_penalty(cell_x, cell_y, FollowerChicken.memory_decay, rows=rows)
+
+        scores = np.maximum(0.01, scores)
+        scores[~valid] = 0
+        return scores
+
+    def relation_edges(self, kind, start, stop):
+        """Edges (i - start, j) of the flattened chickens i in start:stop, sorted by i."""
+        indptr, indices = self.relations[kind]
+        return csr_rows(indptr[start:stop + 1]), indices[indptr[start]:indptr[stop]]
+
+    def social_scores(self, start, stop, new_x, new_y):
+        """Friend and enemy terms of the flattened chickens start:stop, new_x/new_y hold all candidate moves."""
+        x, y = self.x.ravel(), self.y.ravel()
+        scores = np.zeros((stop - start, new_x.shape[-1]))
+
+        def distances(kind):
+            i, j = self.relation_edges(kind, start, stop)
+            rows = i + start
+            current_dist = (np.abs(x[rows] - x[j]) + np.abs(y[rows] - y[j]))[:, None]
+            new_dist = np.abs(new_x[rows] - x[j, None]) + np.abs(new_y[rows] - y[j, None])
+            return i, rows, current_dist, new_dist
+
+        def add(i, term):
+            for move in range(scores.shape[1]):
+                scores[:, move] += np.bincount(i, weights=term[:, move], minlength=stop - start)
+
+        # Friends attract at every candidate except when both stay on the same cell
+        i, rows, current_dist, new_dist = distances("friends")
+        proximity_factor = 1 / np.maximum(1, new_dist)
+        friend_term = np.where((new_dist == 0) & (current_dist == 0), 0, proximity_factor)
+        add(i, self.friend_attraction.ravel()[rows, None] * friend_term)
+
+        # Enemies: reward distance gained, penalise being within 2 squares
+        i, rows, current_dist, new_dist = distances("enemies")
+        proximity_factor = 1 / np.maximum(1, new_dist)
+        enemy_repulsion = self.enemy_repulsion.ravel()[rows, None]
+        add(i, enemy_repulsion * (new_dist - current_dist) / self.social_distance_factor.ravel()[rows, None] -
+            2 * enemy_repulsion * (new_dist <= 2) * proximity_factor)
+        return scores
+
+    def social_field_scores(self, cell_x, cell_y):
+        """Same terms as social_scores for group structured flocks, read from per-group maps."""
+        n = self.x.shape[-1]
+        n_batch = self.x.size // n if n else 0
+        groups, x, y = (a.reshape(n_batch, n) for a in (self.groups, self.x, self.y))
+        replicate = np.arange(n_batch)[:, None]
+
+        # chickens per group and cell, shape (batch, group, H, W)
+        density = np.zeros((n_batch, self.n_groups, self.height, self.width))
+        np.add.at(density, (replicate, groups, y, x), 1)
+        # sum of 1/max(1, d) over members for the friend term, truncated at d <= 2 for enemies
+        attraction = convolve_grid(density, self.friend_kernel)
+        closeness = convolve_grid(density, self.enemy_kernel)
+        # sum of Manhattan distances to the members, separable in x and y
+        distances = (density.sum(axis=-2) @ self.x_distance)[..., None, :] + \
+            (density.sum(axis=-1) @ self.y_distance)[..., :, None]
+        # enemies are all chickens outside the own group
+        enemy_closeness = closeness.sum(axis=1, keepdims=True) - closeness
+        enemy_distances = distances.sum(axis=1, keepdims=True) - distances
+
+        replicate = replicate[..., None]
+        group = groups[..., None]
+        cell_x = cell_x.reshape(n_batch, n, -1)
+        cell_y = cell_y.reshape(n_batch, n, -1)
+        here_x, here_y = x[..., None], y[..., None]
+        standing_still = (cell_x == here_x) & (cell_y == here_y)
+
+        # minus the chicken itself (1 at d <= 1), and when standing still the
+        # flock mates on the same cell, which FollowerChicken.move leaves out
+        friend_score = attraction[replicate, group, cell_y, cell_x] - 1 - \
+            standing_still * (density[replicate, group, here_y, here_x] - 1)
+        distance_change = enemy_distances[replicate, group, cell_y, cell_x] - \
+            enemy_distances[replicate, group, here_y, here_x]
+        proximity_penalty = enemy_closeness[replicate, group, cell_y, cell_x]
+
+        friend_attraction = self.friend_attraction.reshape(n_batch, n)[..., None]
+        enemy_repulsion = self.enemy_repulsion.reshape(n_batch, n)[..., None]
+        social_distance_factor = self.social_distance_factor.reshape(n_batch, n)[..., None]
+        scores = friend_attraction * friend_score + \
+            enemy_repulsion * distance_change / social_distance_factor - \
+            2 * enemy_repulsion * proximity_penalty
+        return scores.reshape(self.x.shape + (-1,))
+
+    def choose_moves(self, scores):
+        """Sample one move per chicken with probability proportional to its score."""
+        cumulative = np.cumsum(scores, axis=-1)
+        if self.flock_random is not None:
+            u = self.flock_random.next().reshape(scores.shape[:-1])
+        else:
+            u = np.random.random(scores.shape[:-1])
+        u = u * cumulative[..., -1]
+        chosen = (cumulative <= u[..., None]).sum(axis=-1)
+        return np.minimum(chosen, len(POSSIBLE_MOVES) - 1)
+
+
+class BatchedCage(VectorCage):
+    """
+    Advances K independent cages with the same layout together.
+
+    Every state array gets a leading replicate axis, so one numpy call moves every
+    chicken of every replicate. The cages keep their own chickens, relationships and
+    resource amounts; their objects are only synced at the end of simulate (or by
+    calling sync_chickens).
+    """
+    def __init__(self, cages, chunk_size=256, social_fields=False):
+        layout = cages[0]
+        for cage in cages:
+            if (cage.width, cage.height) != (layout.width, layout.height) or \
+                    cage.wall_positions != layout.wall_positions or \
+                    [(r.x, r.y) for r in cage.resources] != [(r.x, r.y) for r in layout.resources]:
+                raise ValueError("All cages of a BatchedCage need the same layout")
+        self.cages = cages
+        self.batch_shape = (len(cages),)
+        super().__init__(layout.width, layout.height, [],
+                         [(r.x, r.y) for r in layout.food_sources],
+                         [(r.x, r.y) for r in layout.water_sources],
+                         [(r.x, r.y) for r in layout.bathing_areas],
+                         visit_memory=layout.visit_memory, proximity_radius=layout.proximity_radius,
+                         wall_positions=layout.wall_positions, chunk_size=chunk_size,
+                         social_fields=social_fields)
+
+    def replicates(self):
+        return self.cages
+
+    def sync_visits(self):
+        """Write the visit memory back into the chicken objects (only needed for checkpoints)."""
+        row = 0
+        for cage in self.replicates():
+            for chicken in cage.chickens:
+                chicken.visits = self.visits.extract_row(row)
+                row += 1
+
+    def needs_load(self):
+        return self.x is None
+
+    def update(self):
+        if self.needs_load():
+            self.load_chickens()
+        if self.x.size == 0:
+            return
+        self.timed_step()
+
+    def get_adj_matr(self, radius=None, fmt="dense"):
+        """List with the current adjacency matrix of every replicate."""
+        if self.needs_load():
+            self.load_chickens()
+        radius = self.proximity_radius if radius is None else radius
+        x, y = self.positions()
+        return [adjacency_matrix(x[k], y[k], radius, fmt) for k in range(len(self.cages))]
+
+    def simulate(self, steps, adj_matrix_interval=None, burn_in=100, accumulators=None, stats=None):
+        """
+        Headless Cage.simulate for every replicate.
+
+        Returns:
+            list: Per replicate the list of snapshots, empty when accumulators
+            (one per replicate) are given
+        """
+        stats = self.start_stats(stats, burn_in, steps)
+        adj_matrices = [[] for _ in self.cages]
+        for step in range(steps):
+            self.update()
+            if adj_matrix_interval and step % adj_matrix_interval == 0:
+                started = stats.clock()
+                for k, adj_matrix in enumerate(self.get_adj_matr()):
+                    if accumulators is not None:
+                        accumulators[k].add(adj_matrix)
+                    else:
+                        adj_matrices[k].append(adj_matrix)
+                stats.add("snapshot", started)
+            stats.step_done()
+        started = stats.clock()
+        self.sync_chickens()
+        stats.add("sync", started)
+        stats.finish([chicken for cage in self.cages for chicken in cage.chickens])
+        return adj_matrices
@@ -0,0 +1,181 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+
+class VisitMemory(ABC):
+    """
+    Remembers when each of n chickens last visited each cell.
+
+    Instead of ageing a whole grid every step, only the time of the last visit
+    is stored and the age (steps since the visit) is computed as now - t for the
+    cells that are actually looked at. Ages are -1 for cells never visited.
+    """
+    def __init__(self, n, height, width):
+        self.n = n
+        self.height = height
+        self.width = width
+        self.now = 0
+
+    @abstractmethod
+    def visit(self, x, y):
+        """Advance the clock by one step and record the positions (one per chicken)."""
+
+    @abstractmethod
+    def start(self, x, y):
+        """Record the starting positions without advancing the clock."""
+
+    @abstractmethod
+    def age(self, x, y, rows=0):
+        """Steps since rows last visited (x, y), -1 if never (or no longer) remembered."""
+
+    @abstractmethod
+    def copy_row(self, row, other):
+        """Copy the memory of the single chicken in other into row, aligning the clocks."""
+
+    @abstractmethod
+    def extract_row(self, row):
+        """Memory of the single chicken in row, the inverse of copy_row."""
+
+    @abstractmethod
+    def options(self):
+        """Keyword arguments of make_visit_memory that recreate this kind of memory."""
+
+    @abstractmethod
+    def get_state(self):
+        """Clock and arrays of the memory, set_state() on a memory of the same shape restores them."""
+
+    @abstractmethod
+    def set_state(self, state):
+        pass
+
+    def recency_penalty(self, x, y, memory_decay, rows=0):
+        # Same penalty as FollowerChicken.move: recently visited cells are less attractive
+        age = self.age(x, y, rows)
+        return np.where(age != -1, np.maximum(0, 1 - age / memory_decay), 0)
+
+    def age_grid(self, row=0):
+        """Dense (height, width) grid of ages for one chicken, like the old past_positions_grid."""
+        ys, xs = np.indices((self.height, self.width))
+        return self.age(xs, ys, row)
+
+
+class DenseVisitMemory(VisitMemory):
+    """
+    Last-visit timestamps stored in an (n, height, width) grid.
+
+    The timestamps use a compact dtype. When the clock reaches the end of the dtype
+    range all timestamps are shifted back, visits older than horizon steps then all
+    look horizon steps old (exact ages only matter up to memory_decay).
+    """
+    def __init__(self, n, height, width, dtype=np.int32, horizon=1000):
+        super().__init__(n, height, width)
+        self.never = np.iinfo(dtype).min
+        self.max_time = np.iinfo(dtype).max
+        self.horizon = horizon
+        self.last_visit = np.full((n, height, width), self.never, dtype=dtype)
+
+    def start(self, x, y):
+        self.last_visit[np.arange(self.n), y, x] = self.now
+
+    def visit(self, x, y):
+        if self.now >= self.max_time:
+            self.rebase()
+        self.now += 1
+        self.last_visit[np.arange(self.n), y, x] = self.now
+
+    def rebase(self):
+        shift = self.now - self.horizon
+        visited = self.last_visit != self.never
+        self.last_visit[visited] = np.maximum(self.last_visit[visited].astype(np.int64) - shift, 0)
+        self.now -= shift
+
+    def age(self, x, y, rows=0):
+        t = np.asarray(self.last_visit[rows, y, x], dtype=np.int64)
+        return np.where(t == self.never, -1, self.now - t)
+
+    def copy_row(self, row, other):
+        t = other.last_visit[0].astype(np.int64)
+        shifted = np.maximum(t + (self.now - other.now), self.never + 1)
+        self.last_visit[row] = np.where(t == other.never, self.never, shifted)
+
+    def extract_row(self, row):
+        memory = DenseVisitMemory(1, self.height, self.width, self.last_visit.dtype, self.horizon)
+        memory.now = self.now
+        memory.last_visit[0] = self.last_visit[row]
+        return memory
+
+    def options(self):
+        return {"backend": "dense", "dtype": self.last_visit.dtype.name, "horizon": self.horizon}
+
+    def get_state(self):
+        return {"now": self.now, "last_visit": self.last_visit}
+
+    def set_state(self, state):
+        self.now = int(state["now"])
+        self.last_visit[...] = state["last_visit"]
+
+
+class RingVisitMemory(VisitMemory):
+    """
+    Bounded memory of the last capacity positions of each chicken.
+
+    Memory is O(n * capacity) regardless of the grid size. Cells visited more than
+    capacity steps ago are forgotten (age -1), which does not change the recency
+    penalty as long as capacity >= memory_decay.
+    """
+    def __init__(self, n, height, width, capacity=100):
+        super().__init__(n, height, width)
+        self.capacity = capacity
+        # slot t % capacity holds the position at time t, -1 while unused
+        self.xs = np.full((n, capacity), -1, dtype=np.int16)
+        self.ys = np.full((n, capacity), -1, dtype=np.int16)
+
+    def start(self, x, y):
+        self.xs[:, self.now % self.capacity] = x
+        self.ys[:, self.now % self.capacity] = y
+
+    def visit(self, x, y):
+        self.now += 1
+        self.start(x, y)
+
+    def age(self, x, y, rows=0):
+        x = np.asarray(x)[..., None]
+        y = np.asarray(y)[..., None]
+        slot_age = (self.now - np.arange(self.capacity)) % self.capacity
+        match = (self.xs[rows] == x) & (self.ys[rows] == y)
+        age = np.where(match, slot_age, self.capacity).min(axis=-1)
+        return np.where(age == self.capacity, -1, age)
+
+    def copy_row(self, row, other):
+        shift = (self.now - other.now) % self.capacity
+        self.xs[row] = np.roll(other.xs[0], shift)
+        self.ys[row] = np.roll(other.ys[0], shift)
+
+    def extract_row(self, row):
+        memory = RingVisitMemory(1, self.height, self.width, self.capacity)
+        memory.now = self.now
+        memory.xs[0] = self.xs[row]
+        memory.ys[0] = self.ys[row]
+        return memory
+
+    def options(self):
+        return {"backend": "ring", "capacity": self.capacity}
+
+    def get_state(self):
+        return {"now": self.now, "xs": self.xs, "ys": self.ys}
+
+    def set_state(self, state):
+        self.now = int(state["now"])
+        self.xs[...] = state["xs"]
+        self.ys[...] = state["ys"]
+
+
+VISIT_MEMORIES = {"dense": DenseVisitMemory, "ring": RingVisitMemory}
+
+
+def make_visit_memory(n, height, width, backend="dense", **kwargs):
+    """Create a visit memory, backend is "dense" or "ring" (for huge grids)."""
+    if backend not in VISIT_MEMORIES:
+        raise ValueError(f"Unknown visit memory backend {backend}")
+    return VISIT_MEMORIES[backend](n, height, width, **kwargs)
@@ -1,9 +1,11 @@
-from src.GridObject import GridObject
-from src.Consumable import Consumable
-
-class Water(Consumable):
-    def __init__(self, x, y, max_amount=10000000):
-        super().__init__(x, y, max_amount)
-
-    def consume(self, amount=50):
-        return super().consume(amount)
\ No newline at end of file
+from src.GridObject import GridObject
+from src.Consumable import Consumable
+
+class Water(Consumable):
+    consume_amount = 50  # drunk per visit
+
+    def __init__(self, x, y, max_amount=10000000):
+        super().__init__(x, y, max_amount)
+
+    def consume(self, amount=None):
+        return super().consume(self.consume_amount if amount is None else amount)
\ No newline at end of file
@@ -0,0 +1,95 @@
+import numpy as np
+
+ADJACENCY_FORMATS = ("dense", "coo", "csr")
+
+
+def adjacency_pairs(x, y, radius=1):
+    """
+    Find all ordered pairs (i, j), i != j, of objects within Chebyshev distance radius.
+
+    Objects are bucketed by cell (sorted cell ids), then each of the (2*radius+1)^2
+    neighbouring cells is looked up with a binary search, so the cost is proportional
+    to n log n plus the number of contacts instead of n^2.
+
+    Returns:
+        tuple: (rows, cols) index arrays
+    """
+    x = np.asarray(x, dtype=np.int64)
+    y = np.asarray(y, dtype=np.int64)
+    if len(x) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    x_min, y_min = x.min(), y.min()
+    span = x.max() - x_min + 1
+    y_max = y.max()
+    cell = (y - y_min) * span + (x - x_min)
+    order = np.argsort(cell, kind="stable")
+    sorted_cells = cell[order]
+    objects = np.arange(len(x))
+
+    rows, cols = [], []
+    for dx in range(-radius, radius + 1):
+        tx = x + dx
+        for dy in range(-radius, radius + 1):
+            ty = y + dy
+            inside = (tx >= x_min) & (tx < x_min + span) & (ty >= y_min) & (ty <= y_max)
+            target = (ty[inside] - y_min) * span + (tx[inside] - x_min)
+            lo = np.searchsorted(sorted_cells, target, side="left")
+            counts = np.searchsorted(sorted_cells, target, side="right") - lo
+            # concatenate the ranges order[lo:hi] of all objects without a python loop
+            total = counts.sum()
+            starts = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+            rows.append(np.repeat(objects[inside], counts))
+            cols.append(order[np.arange(total) + starts])
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+    not_self = rows != cols
+    return rows[not_self], cols[not_self]
+
+
+def dense_adjacency(x, y, radius=1):
+    """Boolean adjacency matrix by broadcasting, fine up to a few thousand objects."""
+    x = np.asarray(x, dtype=np.int32)
+    y = np.asarray(y, dtype=np.int32)
+    adj = (np.abs(x[:, None] - x[None, :]) <= radius) & (np.abs(y[:, None] - y[None, :]) <= radius)
+    np.fill_diagonal(adj, False)
+    return adj
+
+
+def dense_adjacency_stack(x, y, radius=1, max_bytes=2 ** 27):
+    """
+    Number of snapshots in which each pair of objects is adjacent, summed over the rows of
+    (snapshots, n) position arrays: the sum of dense_adjacency over the snapshots.
+
+    Snapshots are broadcast together in batches of at most max_bytes of intermediates.
+    """
+    x = np.asarray(x, dtype=np.int32)
+    y = np.asarray(y, dtype=np.int32)
+    n = x.shape[1]
+    counts = np.zeros((n, n), dtype=np.int64)
+    batch = max(1, max_bytes // max(1, 4 * n * n))
+    for start in range(0, len(x), batch):
+        bx, by = x[start:start + batch], y[start:start + batch]
+        adj = (np.abs(bx[:, :, None] - bx[:, None, :]) <= radius) & \
+            (np.abs(by[:, :, None] - by[:, None, :]) <= radius)
+        counts += adj.sum(axis=0)
+    np.fill_diagonal(counts, 0)
+    return counts
+
+
+def sparse_adjacency(x, y, radius=1, fmt="csr"):
+    """Boolean adjacency matrix as a scipy.sparse COO or CSR matrix."""
+    from scipy import sparse  # only needed for sparse snapshots
+
+    rows, cols = adjacency_pairs(x, y, radius)
+    n = len(x)
+    adj = sparse.coo_matrix((np.ones(len(rows), dtype=bool), (rows, cols)), shape=(n, n))
+    return adj.tocsr() if fmt == "csr" else adj
+
+
+def adjacency_matrix(x, y, radius=1, fmt="dense"):
+    """Adjacency of objects at (x, y) within Chebyshev distance radius, fmt is one of ADJACENCY_FORMATS."""
+    if fmt not in ADJACENCY_FORMATS:
+        raise ValueError(f"Unknown adjacency format {fmt}")
+    if fmt == "dense":
+        return dense_adjacency(x, y, radius)
+    return sparse_adjacency(x, y, radius, fmt)
@@ -1,184 +1,311 @@
-import numpy as np
-import networkx as nx
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches 
-import pandas as pd
-import community as community_louvain  
-from networkx.algorithms.community import label_propagation_communities 
-
-def normalize_adj_matrix(adj_matrix: np.array):
-    # Normalize the adjacency matrix
-    # so that the sum of each row is 1
-    row_sums = adj_matrix.sum(axis=1)
-    row_sums[row_sums == 0] = 1  # Avoid division by zero
-    adj_matrix = adj_matrix / row_sums[:, np.newaxis]
-     
-    return adj_matrix
-
-
-def calculate_avg_adj_list(adj_lists):
-    adj_lists = np.array(adj_lists)
-    return np.mean(adj_lists, axis=0)
-
-
-def create_graph(adj_matrix, min_weight=None, max_size=None):
-    G = nx.Graph()
-    num_nodes = adj_matrix.shape[0]
-    G.add_nodes_from(range(num_nodes))
-
-    for i in range(num_nodes):
-        for j in range(i + 1, num_nodes):  # Assuming an undirected graph(otherwise unreadable)
-            weight = adj_matrix[i, j]
-            if weight != 0 and (min_weight is None or weight >= min_weight):
-                G.add_edge(i, j, weight=round(weight, 2))
-    return G
-
-
-def visualize_graph(adj_matrix, all_object_names, min_weight=None, max_size=None):
-    """
-    Visualizes a weighted graph from an adjacency matrix, coloring edges by weight.
-    
-    Parameters:
-    adj_matrix (np.ndarray): 2D NumPy array representing the adjacency matrix.
-    min_weight (float, optional): Minimum edge weight to be included in the graph.
-    """
-
-    node_types = {}
-
-    for idx, obj in enumerate(all_object_names):
-        obj_type = obj.split('_')[0]
-        
-        node_types[idx] = obj_type
-
-    G = create_graph(adj_matrix, min_weight=min_weight)
-    if max_size!= None:# to only take chicken for example
-        G = G.subgraph(range(max_size))
-    #G.add_edge(1, 2, weight=1)# for testing
-    pos = nx.spring_layout(G) 
-    
-    weights = [G[u][v]['weight'] for u,v in G.edges()]
-
-    #edge styling
-    cmap = plt.cm.coolwarm
-    edge_colors = [cmap(weight) for weight in weights]
-    thickness = [(.3+weight)*5 for weight in weights]
-
-    # node styling
-    type_colors = {
-        'chicken': 'red',
-        'food': 'green',
-        'water': 'blue',
-        'bath': 'orange'
-    }
-    
-    node_color_list = [type_colors.get(node_types.get(idx, 'path'), 'grey') for idx in G.nodes()]
-    node_names = {i: all_object_names[i] for i in G.nodes()}
-
-    plt.figure(figsize=(8, 6))
-    nx.draw(G, pos, with_labels=True, node_color=node_color_list, edge_color=edge_colors, 
-            node_size=500, font_size=7, labels=node_names,
-            width = thickness)
-    
-    # Draw edge labels
-    labels = nx.get_edge_attributes(G, 'weight')
-    nx.draw_networkx_edge_labels(G, pos, edge_labels=labels
-                                 )
-    ax = plt.gca()
-    if False:#draw color legend
-        sm = plt.cm.ScalarMappable(cmap=cmap)
-        sm.set_array([])  # Empty array, just to create the colorbar
-        cbar = plt.colorbar(sm, ax=ax)  # Pass the axis explicitly to colorbar
-        cbar.set_label('Edge Weight (Low -> High)')
-
-    legend_labels = {
-        'chicken': 'red',
-        'food': 'green',
-        'water': 'blue',
-        'bath': 'orange'
-    }
-
-    handles = [mpatches.Patch(color=color, label=label) for label, color in legend_labels.items()]
-    ax.legend(handles=handles, title='Node Types')
-    plt.show()
-
-
-def read_week_adj_data(adj_lists, week=1, week_size=5):
-    """
-    Averages the adjacency matrices for a given week and returns the averaged matrix.
-    
-    Parameters:
-    adj_lists (list of np.ndarray): List of adjacency matrices.
-    week (int): The week number to process (1-based).
-    week_size (int): The number of adjacency matrices per week.
-    
-    Returns:
-    np.ndarray: The averaged adjacency matrix for the given week.
-    """
-    # Calculate the starting and ending indices for the current week
-    start_idx = (week - 1) * week_size
-    end_idx = start_idx + week_size
-    
-    # Get the adjacency matrices for the current week
-    week_adj_matrices = adj_lists[start_idx:end_idx]
-    
-    # Calculate the average adjacency matrix for this week
-    avg_adj_matrix = calculate_avg_adj_list(week_adj_matrices)
-    
-    return avg_adj_matrix
-
-
-
-def read_all_weeks(adj_lists, week_size=5):
-    """
-    Processes all the adjacency matrices and averages them by week.
-    
-    Parameters:
-    adj_lists (list of np.ndarray): List of adjacency matrices (one per time step).
-    week_size (int): Number of adjacency matrices per week (default is 5).
-    
-    Returns:
-    pd.DataFrame: DataFrame with the averaged adjacency matrix for each week.
-    """
-    weeks_data = {"names":[],"adj_matr":[]}
-    
-    for week in range(1, (len(adj_lists) // week_size) + 1):
-        avg_adj_matrix = read_week_adj_data(adj_lists, week=week, week_size=week_size)
-        #weeks_data.append({'week': f'week-{week}', 'adj_matrix': avg_adj_matrix})
-        weeks_data["names"].append(f'week-{week}')
-        weeks_data["adj_matr"].append(avg_adj_matrix)
-    
-    all_weeks_avg = calculate_avg_adj_list(adj_lists)
-    weeks_data["names"].append(f'week-all')
-    weeks_data["adj_matr"].append(all_weeks_avg)
-    df_weeks = pd.DataFrame(weeks_data)
-    
-    return df_weeks
-
-
-def create_graph_from_adj_matrix(adj_matrix, clustering_method='louvain',
-        all_object_names=None, max_size=None):
-    G = create_graph(adj_matrix)
-    if max_size!= None:# to only take chicken for example
-        G = G.subgraph(range(max_size))
-    
-    if clustering_method == 'louvain':
-        partition = community_louvain.best_partition(G)
-        communities = list(partition.values())
-    elif clustering_method == 'label_propagation':
-        communities = list(label_propagation_communities(G))
-    else:
-        raise ValueError("Unknown clustering method")
-
-    pos = nx.spring_layout(G)  
-    plt.figure(figsize=(10, 8))
-    nx.draw_networkx_nodes(G, pos, node_size=500, cmap=plt.cm.coolwarm, 
-                           node_color=communities, alpha=0.7)
-    nx.draw_networkx_edges(G, pos, width=1.0, alpha=0.5)
-    if all_object_names != None:
-        print(f"{len(all_object_names)=}, {len(G.nodes())=}")
-        print(all_object_names)
-        node_names = {i: all_object_names[i] for i in G.nodes()}
-
-    nx.draw_networkx_labels(G,pos=pos, labels= node_names if all_object_names!=None else None, font_size=12)
-    plt.title(f"Graph with {clustering_method.capitalize()} Clustering")
-    plt.show()
+import numpy as np
+
+# networkx, matplotlib, pandas and python-louvain are imported by the functions that
+# use them, so simulation workers that only import this module stay light
+
+def normalize_adj_matrix(adj_matrix: np.array):
+    # Normalize the adjacency matrix
+    # so that the sum of each row is 1
+    row_sums = adj_matrix.sum(axis=1)
+    row_sums[row_sums == 0] = 1  # Avoid division by zero
+    adj_matrix = adj_matrix / row_sums[:, np.newaxis]
+     
+    return adj_matrix
+
+
+def calculate_avg_adj_list(adj_lists):
+    adj_lists = np.array(adj_lists)
+    return np.mean(adj_lists, axis=0)
+
+
+# Spring layouts by node set, shared by visualize_graph and create_graph_from_adj_matrix
+LAYOUT_CACHE = {}
+
+
+def graph_edges(adj_matrix, min_weight=None, max_size=None):
+    """
+    (rows, cols, weights) of the upper triangle edges (i < j) with a nonzero weight of at least min_weight.
+
+    adj_matrix is a dense numpy matrix or a scipy.sparse matrix, max_size keeps only the
+    first max_size nodes. Edges are in row-major order.
+    """
+    if max_size is not None:
+        adj_matrix = adj_matrix[:max_size, :max_size]
+    if isinstance(adj_matrix, np.ndarray):
+        keep = adj_matrix != 0
+        if min_weight is not None:
+            keep &= adj_matrix >= min_weight
+        rows, cols = np.nonzero(np.triu(keep, k=1))
+        return rows, cols, adj_matrix[rows, cols]
+    from scipy import sparse
+
+    upper = sparse.triu(sparse.coo_matrix(adj_matrix), k=1).tocsr()
+    upper.eliminate_zeros()
+    upper.sort_indices()
+    upper = upper.tocoo()
+    keep = upper.data >= min_weight if min_weight is not None else np.ones(upper.nnz, dtype=bool)
+    return upper.row[keep], upper.col[keep], upper.data[keep]
+
+
+def create_graph(adj_matrix, min_weight=None, max_size=None):
+    """
+    Weighted undirected networkx graph of an adjacency matrix (dense or scipy.sparse),
+    weights rounded to 2 decimals. The edges are selected with NumPy, see graph_edges.
+    """
+    import networkx as nx
+
+    G = nx.Graph()
+    num_nodes = adj_matrix.shape[0] if max_size is None else min(max_size, adj_matrix.shape[0])
+    G.add_nodes_from(range(num_nodes))
+    rows, cols, weights = graph_edges(adj_matrix, min_weight, max_size)
+    G.add_weighted_edges_from(zip(rows.tolist(), cols.tolist(), np.round(weights, 2).tolist()))
+    return G
+
+
+def graph_layout(G, cache=LAYOUT_CACHE, seed=None):
+    """
+    Spring layout of G, computed once per node set and kept in cache (None = no caching),
+    so the plots of the same nodes share their positions.
+    """
+    import networkx as nx
+
+    key = frozenset(G.nodes())
+    if cache is None or key not in cache:
+        pos = nx.spring_layout(G, seed=seed)
+        if cache is None:
+            return pos
+        cache[key] = pos
+    return cache[key]
+
+
+def louvain_communities(adj_matrix, min_weight=None, resolution=1.0, seed=None, max_levels=20):
+    """
+    Louvain community detection directly on a (sparse) adjacency matrix, without networkx.
+
+    Works on the CSR matrix of the edges of graph_edges (so a dense average matrix is
+    thresholded with min_weight first): nodes are moved to the neighbouring community
+    with the largest modularity gain until no move helps, then the communities are
+    merged into nodes (P^T A P) and the next level starts, as in python-louvain.
+
+    Returns:
+        np.ndarray: Community of every node, numbered from 0 in order of first appearance
+    """
+    from scipy import sparse
+
+    n = adj_matrix.shape[0]
+    rows, cols, weights = graph_edges(adj_matrix, min_weight)
+    upper = sparse.coo_matrix((weights.astype(float), (rows, cols)), shape=(n, n))
+    matrix = (upper + upper.T).tocsr()
+    total = matrix.sum()
+    labels = np.arange(n)
+    if total == 0:
+        return labels
+    rng = np.random.default_rng(seed)
+    for _ in range(max_levels):
+        communities, moved = louvain_level(matrix, total, resolution, rng)
+        if not moved:
+            break
+        labels = communities[labels]
+        merge = sparse.csr_matrix((np.ones(matrix.shape[0]), (np.arange(matrix.shape[0]), communities)))
+        matrix = (merge.T @ matrix @ merge).tocsr()
+    _, first = np.unique(labels, return_index=True)
+    order = np.empty(len(first), dtype=int)
+    order[np.argsort(np.argsort(first))] = np.arange(len(first))
+    return order[np.unique(labels, return_inverse=True)[1]]
+
+
+def louvain_level(matrix, total, resolution, rng):
+    """Local moving phase of one Louvain level, returns (communities numbered 0..k-1, whether a node moved)."""
+    n = matrix.shape[0]
+    degrees = np.asarray(matrix.sum(axis=1)).ravel()
+    community = np.arange(n)
+    community_degree = degrees.copy()
+    indptr, indices, data = matrix.indptr, matrix.indices, matrix.data
+    moved_any = False
+    moved = True
+    while moved:
+        moved = False
+        for node in rng.permutation(n):
+            start, stop = indptr[node], indptr[node + 1]
+            neighbours, weights = indices[start:stop], data[start:stop]
+            not_self = neighbours != node
+            own = community[node]
+            community_degree[own] -= degrees[node]
+            candidates, inverse = np.unique(community[neighbours[not_self]], return_inverse=True)
+            links = np.bincount(inverse, weights=weights[not_self], minlength=len(candidates))
+            gains = links - resolution * community_degree[candidates] * degrees[node] / total
+            own_index = np.searchsorted(candidates, own)
+            stay = gains[own_index] if own_index < len(candidates) and candidates[own_index] == own \
+                else -resolution * community_degree[own] * degrees[node] / total
+            best = own
+            if len(gains) and gains.max() > stay + 1e-12:
+                best = candidates[np.argmax(gains)]
+                moved = moved_any = True
+            community[node] = best
+            community_degree[best] += degrees[node]
+    return np.unique(community, return_inverse=True)[1], moved_any
+
+
+def visualize_graph(adj_matrix, all_object_names, min_weight=None, max_size=None, layout_cache=LAYOUT_CACHE):
+    """
+    Visualizes a weighted graph from an adjacency matrix, coloring edges by weight.
+    
+    Parameters:
+    adj_matrix (np.ndarray): 2D NumPy array (or scipy.sparse matrix) representing the adjacency matrix.
+    min_weight (float, optional): Minimum edge weight to be included in the graph.
+    layout_cache (dict, optional): Layouts by node set, see graph_layout.
+    """
+    import networkx as nx
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as mpatches
+
+    node_types = {}
+
+    for idx, obj in enumerate(all_object_names):
+        obj_type = obj.split('_')[0]
+        
+        node_types[idx] = obj_type
+
+    G = create_graph(adj_matrix, min_weight=min_weight, max_size=max_size)  # max_size to only take chicken for example
+    #G.add_edge(1, 2, weight=1)# for testing
+    pos = graph_layout(G, layout_cache)
+    
+    weights = [G[u][v]['weight'] for u,v in G.edges()]
+
+    #edge styling
+    cmap = plt.cm.coolwarm
+    edge_colors = [cmap(weight) for weight in weights]
+    thickness = [(.3+weight)*5 for weight in weights]
+
+    # node styling
+    type_colors = {
+        'chicken': 'red',
+        'food': 'green',
+        'water': 'blue',
+        'bath': 'orange'
+    }
+    
+    node_color_list = [type_colors.get(node_types.get(idx, 'path'), 'grey') for idx in G.nodes()]
+    node_names = {i: all_object_names[i] for i in G.nodes()}
+
+    plt.figure(figsize=(8, 6))
+    nx.draw(G, pos, with_labels=True, node_color=node_color_list, edge_color=edge_colors, 
+            node_size=500, font_size=7, labels=node_names,
+            width = thickness)
+    
+    # Draw edge labels
+    labels = nx.get_edge_attributes(G, 'weight')
+    nx.draw_networkx_edge_labels(G, pos, edge_labels=labels
+                                 )
+    ax = plt.gca()
+    if False:#draw color legend
+        sm = plt.cm.ScalarMappable(cmap=cmap)
+        sm.set_array([])  # Empty array, just to create the colorbar
+        cbar = plt.colorbar(sm, ax=ax)  # Pass the axis explicitly to colorbar
+        cbar.set_label('Edge Weight (Low -> High)')
+
+    legend_labels = {
+        'chicken': 'red',
+        'food': 'green',
+        'water': 'blue',
+        'bath': 'orange'
+    }
+
+    handles = [mpatches.Patch(color=color, label=label) for label, color in legend_labels.items()]
+    ax.legend(handles=handles, title='Node Types')
+    plt.show()
+
+
+def read_week_adj_data(adj_lists, week=1, week_size=5):
+    """
+    Averages the adjacency matrices for a given week and returns the averaged matrix.
+    
+    Parameters:
+    adj_lists (list of np.ndarray): List of adjacency matrices.
+    week (int): The week number to process (1-based).
+    week_size (int): The number of adjacency matrices per week.
+    
+    Returns:
+    np.ndarray: The averaged adjacency matrix for the given week.
+    """
+    # Calculate the starting and ending indices for the current week
+    start_idx = (week - 1) * week_size
+    end_idx = start_idx + week_size
+    
+    # Get the adjacency matrices for the current week
+    week_adj_matrices = adj_lists[start_idx:end_idx]
+    
+    # Calculate the average adjacency matrix for this week
+    avg_adj_matrix = calculate_avg_adj_list(week_adj_matrices)
+    
+    return avg_adj_matrix
+
+
+
+def read_all_weeks(adj_lists, week_size=5):
+    """
+    Processes all the adjacency matrices and averages them by week.
+    
+    Parameters:
+    adj_lists (list of np.ndarray): List of adjacency matrices (one per time step).
+    week_size (int): Number of adjacency matrices per week (default is 5).
+    
+    Returns:
+    pd.DataFrame: DataFrame with the averaged adjacency matrix for each week.
+    """
+    import pandas as pd
+
+    weeks_data = {"names":[],"adj_matr":[]}
+    
+    for week in range(1, (len(adj_lists) // week_size) + 1):
+        avg_adj_matrix = read_week_adj_data(adj_lists, week=week, week_size=week_size)
+        #weeks_data.append({'week': f'week-{week}', 'adj_matrix': avg_adj_matrix})
+        weeks_data["names"].append(f'week-{week}')
+        weeks_data["adj_matr"].append(avg_adj_matrix)
+    
+    all_weeks_avg = calculate_avg_adj_list(adj_lists)
+    weeks_data["names"].append(f'week-all')
+    weeks_data["adj_matr"].append(all_weeks_avg)
+    df_weeks = pd.DataFrame(weeks_data)
+    
+    return df_weeks
+
+
+def create_graph_from_adj_matrix(adj_matrix, clustering_method='louvain',
+        all_object_names=None, max_size=None, layout_cache=LAYOUT_CACHE):
+    # clustering_method 'sparse_louvain' runs louvain_communities on the matrix instead
+    # of python-louvain on the networkx graph, for large flocks
+    import networkx as nx
+    import matplotlib.pyplot as plt
+
+    G = create_graph(adj_matrix, max_size=max_size)  # max_size to only take chicken for example
+    
+    if clustering_method == 'louvain':
+        import community as community_louvain
+
+        partition = community_louvain.best_partition(G)
+        communities = list(partition.values())
+    elif clustering_method == 'sparse_louvain':
+        matrix = adj_matrix if max_size is None else adj_matrix[:max_size, :max_size]
+        communities = louvain_communities(matrix).tolist()
+    elif clustering_method == 'label_propagation':
+        from networkx.algorithms.community import label_propagation_communities
+
+        label = {node: k for k, community in enumerate(label_propagation_communities(G)) for node in community}
+        communities = [label[node] for node in G.nodes()]
+    else:
+        raise ValueError("Unknown clustering method")
+
+    pos = graph_layout(G, layout_cache)
+    plt.figure(figsize=(10, 8))
+    nx.draw_networkx_nodes(G, pos, node_size=500, cmap=plt.cm.coolwarm, 
+                           node_color=communities, alpha=0.7)
+    nx.draw_networkx_edges(G, pos, width=1.0, alpha=0.5)
+    if all_object_names != None:
+        print(f"{len(all_object_names)=}, {len(G.nodes())=}")
+        print(all_object_names)
+        node_names = {i: all_object_names[i] for i in G.nodes()}
+
+    nx.draw_networkx_labels(G,pos=pos, labels= node_names if all_object_names!=None else None, font_size=12)
+    plt.title(f"Graph with {clustering_method.capitalize()} Clustering")
+    plt.show()